@@ -0,0 +1,76 @@
+import os
+import struct
+import sys
+import timeit
+from array import array
+
+from inet_checksum import bit_checksum, calculate_checksum, update_checksum
+
+SIZES = [8, 16, 64, 512, 1500, 8192, 65536]
+
+# прежняя реализация из hw10.py / hw11_traceroute.py, для сравнения
+def loop_bit_checksum(data):
+    K = 16
+    total_sum = 0
+    for i in range(0, len(data), 2):
+        word = (data[i] << 8) + (data[i+1] if i+1 < len(data) else 0)
+        total_sum += word
+    while total_sum >> K:
+        total_sum = (total_sum & 0xFFFF) + (total_sum >> K)
+    return total_sum & 0xFFFF
+
+def array_bit_checksum(data):
+    if len(data) % 2:
+        data = bytes(data) + b'\x00'
+    total = sum(array('H', data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    # array('H') читает слова в порядке хоста, сумма RFC 1071 от этого только меняет байты местами
+    if sys.byteorder == 'little':
+        total = ((total & 0xFF) << 8) | (total >> 8)
+    return total
+
+def best_time(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+def bench_full():
+    print(f"{'size':>7} {'loop, us':>12} {'array, us':>12} {'int fold, us':>14} {'speedup':>9}")
+    for size in SIZES:
+        data = os.urandom(size)
+        expected = loop_bit_checksum(data)
+        assert array_bit_checksum(data) == expected
+        assert bit_checksum(data) == expected
+
+        number = max(10, 200000 // size)
+        loop_time = best_time(lambda: loop_bit_checksum(data), number)
+        array_time = best_time(lambda: array_bit_checksum(data), number)
+        fold_time = best_time(lambda: bit_checksum(data), number)
+        print(f"{size:>7} {loop_time * 1e6:>12.2f} {array_time * 1e6:>12.2f} {fold_time * 1e6:>14.2f} "
+              f"{loop_time / fold_time:>8.1f}x")
+
+def bench_incremental():
+    print(f"\n{'payload':>7} {'full, us':>12} {'incremental, us':>17}   (echo probe, seq + timestamp changed)")
+    for padding in (0, 56, 1400, 8192):
+        extra = os.urandom(padding)
+        header = struct.pack('!BBHHH', 8, 0, 0, 4242, 0)
+        base = calculate_checksum(header + struct.pack('!Q', 0) + extra)
+        old_field = bytes(10)
+
+        def full(seq):
+            packet = struct.pack('!BBHHHQ', 8, 0, 0, 4242, seq, seq * 1000) + extra
+            return calculate_checksum(packet)
+
+        def incremental(seq):
+            return update_checksum(base, old_field, struct.pack('!HQ', seq, seq * 1000))
+
+        for seq in (1, 77, 65535):
+            assert full(seq) == incremental(seq)
+
+        number = 20000
+        full_time = best_time(lambda: full(12345), number)
+        incremental_time = best_time(lambda: incremental(12345), number)
+        print(f"{8 + padding:>7} {full_time * 1e6:>12.2f} {incremental_time * 1e6:>17.2f}")
+
+if __name__ == "__main__":
+    bench_full()
+    bench_incremental()
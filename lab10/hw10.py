@@ -1,87 +1,247 @@
+import argparse
+import os
 import socket
 import struct
 import time
 import sys
 
-def bit_checksum(data):
-    K = 16
-    total_sum = 0
-    for i in range(0, len(data), 2):
-        word = (data[i] << 8) + (data[i+1] if i+1 < len(data) else 0)
-        total_sum += word
-    while total_sum >> K:
-        total_sum = (total_sum & 0xFFFF) + (total_sum >> K)
-    return total_sum & 0xFFFF
-
-def calculate_checksum(data):
-    raw_sum = bit_checksum(data)
-    return ~raw_sum & 0xFFFF
-
-def ping(host, count=4):
+from inet_checksum import calculate_checksum
+from rtt_stats import RttHistogram
+
+ICMP_ECHO_REPLY = 0
+TIMEOUT = 1
+LATE_WINDOW = 5
+RECV_SIZE = 2048
+NS_PER_SEC = 1_000_000_000
+NS_PER_MS = 1_000_000
+FLOOD_INTERVAL = 0.01
+
+def create_packet(id, seq_num):
+    header = struct.pack('!BBHHH', 8, 0, 0, id, seq_num)
+    data = struct.pack('!Q', time.monotonic_ns())
+    checksum_val = calculate_checksum(header + data)
+    header = struct.pack('!BBHHH', 8, 0, checksum_val, id, seq_num)
+    return header + data
+
+def open_icmp_socket():
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.getprotobyname('icmp'))
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.getprotobyname('icmp'))
     except PermissionError:
         print("Error: ICMP messages can only be sent from root processes (add sudo).")
         sys.exit(1)
-        
+
+def new_target(host, addr):
+    return {"host": host, "addr": addr, "sent": 0, "received": 0, "late": 0, "duplicates": 0,
+            "histogram": RttHistogram()}
+
+def parse_echo_reply(packet):
+    if len(packet) < 20:
+        return None
+    ihl = (packet[0] & 0x0F) * 4
+    if len(packet) < ihl + 8:
+        return None
+    type, _, _, p_id, p_seq = struct.unpack_from('!BBHHH', packet, ihl)
+    return type, p_id, p_seq
+
+class ReplyDispatcher:
+    def __init__(self, sock, timeout=TIMEOUT, on_event=None):
+        self.sock = sock
+        self.id = os.getpid() & 0xFFFF
+        self.timeout_ns = int(timeout * NS_PER_SEC)
+        self.late_window_ns = LATE_WINDOW * NS_PER_SEC
+        self.on_event = on_event or (lambda kind, target, seq, rtt: None)
+        self.next_seq = 0
+        # seq -> проба; словарь хранит порядок отправки, поэтому старые пробы всегда в начале
+        self.probes = {}
+
+    def send(self, target):
+        self.next_seq = (self.next_seq + 1) & 0xFFFF
+        seq = self.next_seq
+        self.sock.sendto(create_packet(self.id, seq), (target["addr"], 0))
+        self.probes.pop(seq, None)
+        self.probes[seq] = {"target": target, "sent": time.monotonic_ns(), "replied": False, "expired": False}
+        target["sent"] += 1
+        return seq
+
+    def drain(self, until_ns, stop_on_reply=False):
+        while True:
+            self.expire()
+            remaining = until_ns - time.monotonic_ns()
+            if remaining <= 0:
+                return
+            self.sock.settimeout(remaining / NS_PER_SEC)
+            try:
+                packet, _ = self.sock.recvfrom(RECV_SIZE)
+            except socket.timeout:
+                continue
+            if self.dispatch(packet, time.monotonic_ns()) == "reply" and stop_on_reply:
+                return
+
+    def finish(self):
+        if self.probes:
+            last = next(reversed(self.probes.values()))
+            self.drain(last["sent"] + self.timeout_ns)
+
+    def dispatch(self, packet, now):
+        reply = parse_echo_reply(packet)
+        if reply is None:
+            return None
+        type, p_id, p_seq = reply
+        probe = self.probes.get(p_seq)
+        if type != ICMP_ECHO_REPLY or p_id != self.id or probe is None:
+            return None
+
+        target = probe["target"]
+        rtt_ns = now - probe["sent"]
+        if probe["replied"]:
+            target["duplicates"] += 1
+            kind = "duplicate"
+        elif probe["expired"] or rtt_ns > self.timeout_ns:
+            probe["replied"] = True
+            target["late"] += 1
+            kind = "late"
+        else:
+            probe["replied"] = True
+            target["received"] += 1
+            target["histogram"].record(rtt_ns)
+            kind = "reply"
+        self.on_event(kind, target, p_seq, rtt_ns / NS_PER_MS)
+        return kind
+
+    def expire(self):
+        now = time.monotonic_ns()
+        stale = []
+        for seq, probe in self.probes.items():
+            age = now - probe["sent"]
+            if age <= self.timeout_ns:
+                break
+            if not probe["expired"]:
+                probe["expired"] = True
+                if not probe["replied"]:
+                    self.on_event("timeout", probe["target"], seq, None)
+            if age > self.timeout_ns + self.late_window_ns:
+                stale.append(seq)
+        for seq in stale:
+            del self.probes[seq]
+
+def print_event(kind, target, seq, rtt):
+    if kind == "reply":
+        print(f"reply from {target['addr']} -- seq: {seq} rtt: {rtt:.1f} ms")
+    elif kind == "late":
+        print(f"late reply from {target['addr']} -- seq: {seq} rtt: {rtt:.1f} ms")
+    elif kind == "duplicate":
+        print(f"duplicate reply from {target['addr']} -- seq: {seq} rtt: {rtt:.1f} ms")
+    else:
+        print(f"request timeout for seq {seq}")
+
+def print_statistics(target):
+    sent_packets = target["sent"]
+    received_packets = target["received"]
+    histogram = target["histogram"]
+    loss = ((sent_packets - received_packets) / sent_packets) * 100 if sent_packets else 0
+
+    def ms(value_us):
+        return value_us / 1000
+
+    print(f"packets: sent = {sent_packets}, received = {received_packets}, lost = {sent_packets - received_packets} ({loss:.0f}% loss)")
+    if target["late"] or target["duplicates"]:
+        print(f"late = {target['late']}, duplicates = {target['duplicates']}")
+    if not histogram.count:
+        print("rtt: min = 0.0 ms, max = 0.0 ms, avg = 0.0 ms")
+        return
+    print(f"rtt: min = {ms(histogram.min_us):.3f} ms, max = {ms(histogram.max_seen_us):.3f} ms, "
+          f"avg = {ms(histogram.mean):.3f} ms, stddev = {ms(histogram.stddev()):.3f} ms, "
+          f"jitter = {ms(histogram.jitter):.3f} ms")
+    print(f"percentiles: p50 = {ms(histogram.percentile(50)):.3f} ms, p90 = {ms(histogram.percentile(90)):.3f} ms, "
+          f"p99 = {ms(histogram.percentile(99)):.3f} ms, p99.9 = {ms(histogram.percentile(99.9)):.3f} ms")
+
+def ping(host, count=4, interval=1, timeout=TIMEOUT, flood=False):
+    sock = open_icmp_socket()
+
     dest_addr = socket.gethostbyname(host)
-    id = 25723
-    seq_num = 1
-    rtt_list = []
-    sent_packets = 0
-    received_packets = 0
+    target = new_target(host, dest_addr)
+    # во flood-режиме печать каждого ответа стоила бы дороже самого пинга
+    dispatcher = ReplyDispatcher(sock, timeout, None if flood else print_event)
+    interval_ns = int((min(interval, FLOOD_INTERVAL) if flood else interval) * NS_PER_SEC)
 
     print(f"Pinging {dest_addr}:")
 
+    # расписание считается от старта, а не от момента отправки, поэтому интервал не уплывает
+    next_send = time.monotonic_ns()
     for _ in range(count):
-        header = struct.pack('!BBHHH', 8, 0, 0, id, seq_num)
-        data = struct.pack('d', time.time())
-        checksum_val = calculate_checksum(header + data)
-        header = struct.pack('!BBHHH', 8, 0, checksum_val, id, seq_num)
-        packet = header + data
+        try:
+            dispatcher.send(target)
+        except OSError as e:
+            print(f"Failed to send packet: {e}")
+        next_send += interval_ns
+        dispatcher.drain(next_send, stop_on_reply=flood)
+        if flood:
+            next_send = min(next_send, time.monotonic_ns())
+    dispatcher.finish()
 
-        sock.sendto(packet, (host, 0))
-        sent_packets += 1
+    sock.close()
 
-        sock.settimeout(1)
-        
+    print("\nPing statistics:")
+    print_statistics(target)
+
+def ping_many(hosts, count=4, interval=1, timeout=TIMEOUT):
+    sock = open_icmp_socket()
+
+    # все цели делят один сокет и один identifier, ответы разбираются по (id, seq)
+    targets = []
+    for host in hosts:
         try:
-            recv_packet, addr = sock.recvfrom(1024)
-            end_time = time.time()
-            
-            icmp_header = recv_packet[20:28] 
-            type, _, _, p_id, _ = struct.unpack('!BBHHH', icmp_header)
-
-            if p_id == id and type == 0:
-                rtt = (end_time - struct.unpack('d', recv_packet[28:36])[0]) * 1000
-                rtt_list.append(rtt)
-                received_packets += 1
-                print(f"reply from {addr[0]} -- seq: {seq_num} rtt: {rtt:.1f} ms")
-            else:
-                print(f"unexpected packet from {addr[0]}")
-        except socket.timeout:
-            print(f"request timeout for seq {seq_num}")
-
-        seq_num += 1
-        time.sleep(1)
+            targets.append(new_target(host, socket.gethostbyname(host)))
+        except socket.gaierror:
+            print(f"Failed to get host address: {host}")
+    dispatcher = ReplyDispatcher(sock, timeout)
+    interval_ns = int(interval * NS_PER_SEC)
 
-    sock.close()
+    print(f"Pinging {len(targets)} hosts:")
 
-    loss = ((sent_packets - received_packets) / sent_packets) * 100
-    if rtt_list:
-        min_rtt = min(rtt_list)
-        max_rtt = max(rtt_list)
-        avg_rtt = sum(rtt_list) / len(rtt_list)
-    else:
-        min_rtt = max_rtt = avg_rtt = 0
+    next_round = time.monotonic_ns()
+    for _ in range(count):
+        next_round += interval_ns
+        for target in targets:
+            try:
+                dispatcher.send(target)
+            except OSError as e:
+                print(f"Failed to send packet to {target['host']}: {e}")
+        dispatcher.drain(next_round)
+    dispatcher.finish()
+
+    sock.close()
 
     print("\nPing statistics:")
-    print(f"packets: sent = {sent_packets}, received = {received_packets}, lost = {sent_packets - received_packets} ({loss:.0f}% loss)")
-    print(f"rtt: min = {min_rtt:.1f} ms, max = {max_rtt:.1f} ms, avg = {avg_rtt:.1f} ms")
+    for target in targets:
+        print(f"--- {target['host']} ({target['addr']}) ---")
+        print_statistics(target)
+
+def read_hosts(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="ICMP echo ping for one or many hosts")
+    parser.add_argument("hosts", nargs="*", help="target hosts")
+    parser.add_argument("-f", "--file", help="read target hosts from a file, one per line")
+    parser.add_argument("-c", "--count", type=int, default=8, help="probes per host")
+    parser.add_argument("-i", "--interval", type=float, default=1.0,
+                        help="seconds between probes, fractions like 0.0005 are allowed")
+    parser.add_argument("-W", "--timeout", type=float, default=TIMEOUT, help="seconds to wait for a reply")
+    parser.add_argument("--flood", action="store_true",
+                        help="send the next probe as soon as a reply arrives (single host only)")
+    args = parser.parse_args()
 
-    target_host = sys.argv[1]
-    ping(target_host, count=8)
+    hosts = list(args.hosts)
+    if args.file:
+        hosts += read_hosts(args.file)
+    if not hosts:
+        parser.error("no target hosts given")
+
+    if len(hosts) > 1:
+        if args.flood:
+            parser.error("--flood works with a single host only")
+        ping_many(hosts, args.count, args.interval, args.timeout)
+    else:
+        ping(hosts[0], args.count, args.interval, args.timeout, args.flood)
@@ -0,0 +1,42 @@
+import struct
+import sys
+
+SMALL_LIMIT = 64
+
+# Интернет-контрольная сумма (RFC 1071), общая для lab10 и lab11.
+# Сумма считается не циклом по словам, а над одним большим int: его многократно
+# складываем пополам (2^16 ≡ 1 по модулю 0xFFFF), вся работа идёт внутри C.
+# Для коротких заголовков быстрее один struct.unpack.
+
+def bit_checksum(data):
+    if len(data) % 2:
+        data = bytes(data) + b'\x00'
+    if len(data) <= SMALL_LIMIT:
+        total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+        while total >> 16:
+            total = (total & 0xFFFF) + (total >> 16)
+        return total
+    total = int.from_bytes(data, 'big')
+    width = len(data) * 8
+    while width > 16:
+        width = ((width // 16 + 1) // 2) * 16
+        total = (total >> width) + (total & ((1 << width) - 1))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return total
+
+def calculate_checksum(data):
+    raw_sum = bit_checksum(data)
+    return ~raw_sum & 0xFFFF
+
+def update_checksum(old_checksum, old_field, new_field):
+    # RFC 1624: HC' = ~(~HC + ~m + m'), поле должно начинаться с чётного смещения
+    total = (~old_checksum & 0xFFFF) + (~bit_checksum(old_field) & 0xFFFF) + bit_checksum(new_field)
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(1)
+    print(f"0x{calculate_checksum(sys.argv[1].encode()):04x}")
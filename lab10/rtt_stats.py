@@ -0,0 +1,66 @@
+import math
+from array import array
+
+HIST_SUB_BITS = 7
+HIST_MAX_US = 1 << 32
+
+# Гистограмма RTT с фиксированной памятью, общая для ping из lab10 и
+# нагрузочного теста caps-сервера из lab11: перцентили без хранения всех
+# замеров, среднее и дисперсия по Уэлфорду, джиттер как в RFC 3550.
+
+class RttHistogram:
+    # логарифмические корзины как в HdrHistogram: до 2^7 мкс точно, дальше 64 корзины на октаву
+    def __init__(self, sub_bits=HIST_SUB_BITS, max_us=HIST_MAX_US):
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.half = self.sub_count >> 1
+        self.max_us = max_us
+        self.counts = array('Q', [0] * (self.bucket(max_us) + 1))
+        self.count = 0
+        self.min_us = None
+        self.max_seen_us = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.jitter = 0.0
+        self.prev_us = None
+
+    def bucket(self, value):
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits
+        return self.sub_count + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def bucket_value(self, index):
+        if index < self.sub_count:
+            return index
+        shift = (index - self.sub_count) // self.half + 1
+        mantissa = (index - self.sub_count) % self.half + self.half
+        return (mantissa << shift) + (1 << (shift - 1))
+
+    def record(self, rtt_ns):
+        value = min(rtt_ns // 1000, self.max_us)
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_seen_us = max(self.max_seen_us, value)
+
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.prev_us is not None:
+            self.jitter += (abs(value - self.prev_us) - self.jitter) / 16
+        self.prev_us = value
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_value(index), self.max_seen_us)
+        return self.max_seen_us
+
+    def stddev(self):
+        return math.sqrt(self.m2 / self.count) if self.count > 1 else 0.0
@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lab10'))
+from rtt_stats import RttHistogram
+
+from hw11_caps_protocol import FRAMINGS, FrameDecoder, encode_frame
+
+HOST = '::1'
+DEFAULT_PORT = 8120
+CONNECTIONS = 50
+DURATION = 10
+WARMUP = 1
+SIZES = "16:8,256:1,4096:1"
+READ_SIZE = 65536
+MIX_LENGTH = 4096
+CONNECT_TIMEOUT = 5
+NS_PER_SEC = 1_000_000_000
+
+# Нагрузка на caps-сервер: N соединений, смесь размеров сообщений.
+# Замкнутый цикл (--rate 0): каждое соединение держит --pipeline запросов в полёте
+# и шлёт следующий сразу после ответа. Открытый цикл (--rate): запросы уходят по
+# расписанию, и задержка считается от запланированного момента, а не от фактической
+# отправки - иначе медленный сервер сам себе занижал бы хвосты (coordinated omission).
+
+def parse_sizes(spec):
+    sizes, weights = [], []
+    for part in spec.split(","):
+        size, _, weight = part.partition(":")
+        sizes.append(int(size))
+        weights.append(float(weight or 1))
+    return sizes, weights
+
+class Stats:
+    def __init__(self):
+        self.histogram = RttHistogram()
+        self.sent = 0
+        self.received = 0
+        self.bytes = 0
+        self.errors = 0
+        self.measure_from = None
+        self.measure_to = None
+
+    def measuring(self, now):
+        return self.measure_from <= now < self.measure_to
+
+async def run_connection(port, framing, frames, mix, stats, rate, pipeline, stop):
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(HOST, port, family=socket.AF_INET6), CONNECT_TIMEOUT)
+    decoder = FrameDecoder(framing)
+    # (момент отправки, размер ответа); сервер отвечает строго по порядку
+    pending = deque()
+    sizes = itertools.cycle(mix)
+
+    def send(start):
+        size = next(sizes)
+        writer.write(frames[size])
+        pending.append((start, size))
+        if stats.measuring(start):
+            stats.sent += 1
+
+    def complete(now):
+        start, size = pending.popleft()
+        if stats.measuring(start):
+            stats.histogram.record(now - start)
+            stats.received += 1
+            stats.bytes += size
+
+    async def schedule():
+        interval = NS_PER_SEC / rate
+        next_send = time.monotonic_ns() + random.random() * interval
+        while not stop.is_set():
+            delay = next_send - time.monotonic_ns()
+            if delay > 0:
+                await asyncio.sleep(delay / NS_PER_SEC)
+            send(int(next_send))
+            next_send += interval
+            await writer.drain()
+
+    scheduler = None
+    if rate:
+        scheduler = asyncio.ensure_future(schedule())
+    else:
+        for _ in range(pipeline):
+            send(time.monotonic_ns())
+
+    # в raw-режиме кадров нет: ответ готов, когда пришло столько же байт, сколько ушло
+    raw_bytes = 0
+    try:
+        while not stop.is_set():
+            data = await reader.read(READ_SIZE)
+            if not data:
+                raise ConnectionError("server closed the connection")
+            now = time.monotonic_ns()
+            if framing == "raw":
+                raw_bytes += len(data)
+                done = 0
+                while pending and raw_bytes >= pending[0][1]:
+                    raw_bytes -= pending[0][1]
+                    complete(now)
+                    done += 1
+            else:
+                done = len(decoder.feed(data))
+                for _ in range(done):
+                    complete(now)
+            if not rate:
+                for _ in range(done):
+                    send(now)
+    finally:
+        if scheduler:
+            scheduler.cancel()
+        writer.close()
+
+async def bench(port, connections, duration, warmup, rate, pipeline, sizes, weights, framing):
+    payloads = {size: encode_frame(framing, b'a' * size) for size in sizes}
+    stats = Stats()
+    stop = asyncio.Event()
+    now = time.monotonic_ns()
+    stats.measure_from = now + int(warmup * NS_PER_SEC)
+    stats.measure_to = stats.measure_from + int(duration * NS_PER_SEC)
+
+    tasks = []
+    for _ in range(connections):
+        mix = random.choices(sizes, weights, k=MIX_LENGTH)
+        tasks.append(asyncio.ensure_future(
+            run_connection(port, framing, payloads, mix, stats, rate / connections, pipeline, stop)))
+
+    await asyncio.sleep((stats.measure_to - time.monotonic_ns()) / NS_PER_SEC)
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception) and not isinstance(result, asyncio.CancelledError):
+            stats.errors += 1
+            print(f"Connection error: {result!r}", file=sys.stderr)
+    return stats
+
+def report(stats, args):
+    histogram = stats.histogram
+
+    def ms(value_us):
+        return round(value_us / 1000, 3)
+
+    return {
+        "connections": args.connections,
+        "mode": f"open loop, {args.rate:g} msg/s" if args.rate else f"closed loop, pipeline {args.pipeline}",
+        "framing": args.framing,
+        "sizes": args.sizes,
+        "duration": args.duration,
+        "sent": stats.sent,
+        "received": stats.received,
+        "errors": stats.errors,
+        "throughput": round(stats.received / args.duration, 1),
+        "mbytes_per_sec": round(stats.bytes / args.duration / 1e6, 3),
+        "p50": ms(histogram.percentile(50)),
+        "p99": ms(histogram.percentile(99)),
+        "p999": ms(histogram.percentile(99.9)),
+        "max": ms(histogram.max_seen_us),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator and latency benchmark for the caps server")
+    parser.add_argument("port", nargs="?", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-c", "--connections", type=int, default=CONNECTIONS)
+    parser.add_argument("-d", "--duration", type=float, default=DURATION, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=WARMUP, help="seconds before measuring starts")
+    parser.add_argument("-r", "--rate", type=float, default=0,
+                        help="total messages per second (open loop); 0 runs closed loop")
+    parser.add_argument("--pipeline", type=int, default=1,
+                        help="requests in flight per connection in closed loop")
+    parser.add_argument("-s", "--sizes", default=SIZES,
+                        help="message size mix as size:weight pairs, e.g. 16:8,256:1,4096:1")
+    parser.add_argument("--framing", choices=FRAMINGS, default="raw",
+                        help="must match the server's --framing")
+    parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+    args = parser.parse_args()
+
+    sizes, weights = parse_sizes(args.sizes)
+    try:
+        stats = asyncio.run(bench(args.port, args.connections, args.duration, args.warmup, args.rate,
+                                  args.pipeline, sizes, weights, args.framing))
+    except KeyboardInterrupt:
+        sys.exit(1)
+
+    result = report(stats, args)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"{result['connections']} connections, {result['mode']}, framing {result['framing']}, "
+              f"sizes {result['sizes']}")
+        print(f"messages: sent = {result['sent']}, received = {result['received']}, "
+              f"connection errors = {result['errors']}")
+        print(f"throughput: {result['throughput']:.0f} msg/s, {result['mbytes_per_sec']:.2f} MB/s")
+        print(f"latency: p50 = {result['p50']:.3f} ms, p99 = {result['p99']:.3f} ms, "
+              f"p99.9 = {result['p999']:.3f} ms, max = {result['max']:.3f} ms")
@@ -1,33 +1,84 @@
+import argparse
 import socket
 import sys
+import threading
 
-HOST = '::1'  
+from hw11_caps_protocol import FRAMINGS, FrameDecoder, encode_frame
+
+HOST = '::1'
 DEFAULT_PORT = 8120
 BUFFER_SIZE = 1024
+PIPELINE_BUFFER = 65536
+PIPELINE_BATCH = 256
+
+def receive_frames(sock, decoder, buffer_size=BUFFER_SIZE):
+    while True:
+        data = sock.recv(buffer_size)
+        if not data:
+            raise ConnectionError("server closed the connection")
+        frames = decoder.feed(data)
+        if frames:
+            return frames
 
-def run_client(port):
+def run_client(port, framing="raw"):
     try:
         with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as client_sock:
             client_sock.connect((HOST, port))
             print(f"Connected to server on port {port}.")
+            decoder = FrameDecoder(framing)
 
             while True:
                 message = input("Enter message: ")
-                client_sock.sendall(message.encode())
-                data = client_sock.recv(BUFFER_SIZE)
-                print(f"Received: {data.decode()}")
+                client_sock.sendall(encode_frame(framing, message.encode()))
+                for data in receive_frames(client_sock, decoder):
+                    print(f"Received: {data.decode()}")
     except Exception as e:
         print(f"Client error: {e}")
         sys.exit(1)
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
+def run_pipelined(port, framing, messages):
+    # запросы уходят подряд, не дожидаясь ответов; отправка в отдельном потоке,
+    # иначе при заполненных буферах обе стороны ждали бы друг друга
+    def send_all():
         try:
-            port = int(sys.argv[1])
-        except ValueError:
-            print("Invalid port number. Using default port.")
-            port = DEFAULT_PORT
-    else:
+            for start in range(0, len(messages), PIPELINE_BATCH):
+                batch = messages[start:start + PIPELINE_BATCH]
+                client_sock.sendall(b''.join(encode_frame(framing, message.encode()) for message in batch))
+        except OSError as e:
+            print(f"Client error: {e}", file=sys.stderr)
+
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as client_sock:
+            client_sock.connect((HOST, port))
+            sender = threading.Thread(target=send_all, daemon=True)
+            sender.start()
+
+            decoder = FrameDecoder(framing)
+            received = 0
+            while received < len(messages):
+                frames = receive_frames(client_sock, decoder, PIPELINE_BUFFER)
+                sys.stdout.write(''.join(f"{data.decode()}\n" for data in frames))
+                received += len(frames)
+            sender.join()
+    except Exception as e:
+        print(f"Client error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client for the caps server; with --framing and "
+                                                 "piped stdin every line is sent without waiting for replies")
+    parser.add_argument("port", nargs="?", default=str(DEFAULT_PORT))
+    parser.add_argument("--framing", choices=FRAMINGS, default="raw",
+                        help="must match the server's --framing")
+    args = parser.parse_args()
+
+    try:
+        port = int(args.port)
+    except ValueError:
+        print("Invalid port number. Using default port.")
         port = DEFAULT_PORT
-    
-    run_client(port)
+
+    if args.framing != "raw" and not sys.stdin.isatty():
+        run_pipelined(port, args.framing, sys.stdin.read().splitlines())
+    else:
+        run_client(port, args.framing)
@@ -0,0 +1,63 @@
+import struct
+
+FRAMINGS = ("raw", "line", "length")
+LENGTH_PREFIX = struct.Struct('!I')
+MAX_FRAME = 1 << 20
+
+# Кадрирование поверх TCP: один recv - не одно сообщение. Сообщение может прийти
+# частями или слипнуться с соседними, поэтому байты копятся в буфере, а наружу
+# отдаются только целые кадры.
+#   line   - сообщение заканчивается '\n' (внутри сообщения переводов строк нет)
+#   length - 4 байта длины в сетевом порядке, затем само сообщение
+#   raw    - старое поведение: что пришло одним recv, то и сообщение
+
+def encode_frame(framing, payload):
+    if framing == "line":
+        return payload + b'\n'
+    if framing == "length":
+        return LENGTH_PREFIX.pack(len(payload)) + payload
+    return payload
+
+class FrameDecoder:
+    def __init__(self, framing, max_frame=MAX_FRAME):
+        self.framing = framing
+        self.max_frame = max_frame
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def feed(self, data):
+        if self.framing == "raw":
+            return [bytes(data)]
+        self.buffer += data
+        frames = self._split_lines() if self.framing == "line" else self._split_lengths()
+        # разобранное начало сдвигаем один раз за feed, а не после каждого кадра
+        if self.offset:
+            del self.buffer[:self.offset]
+            self.offset = 0
+        return frames
+
+    def _split_lines(self):
+        frames = []
+        buffer = self.buffer
+        while True:
+            end = buffer.find(b'\n', self.offset)
+            if end < 0:
+                if len(buffer) - self.offset > self.max_frame:
+                    raise ValueError("frame too long")
+                return frames
+            frames.append(bytes(buffer[self.offset:end]))
+            self.offset = end + 1
+
+    def _split_lengths(self):
+        frames = []
+        buffer = self.buffer
+        while len(buffer) - self.offset >= LENGTH_PREFIX.size:
+            size, = LENGTH_PREFIX.unpack_from(buffer, self.offset)
+            if size > self.max_frame:
+                raise ValueError("frame too long")
+            start = self.offset + LENGTH_PREFIX.size
+            if len(buffer) < start + size:
+                break
+            frames.append(bytes(buffer[start:start + size]))
+            self.offset = start + size
+        return frames
@@ -1,46 +1,180 @@
+import argparse
+import asyncio
+import codecs
+import logging
+import signal
 import socket
 import sys
 
-HOST = '::1' 
-DEFAULT_PORT = 8120 
+from hw11_caps_protocol import FRAMINGS, FrameDecoder, encode_frame
+
+HOST = '::1'
+DEFAULT_PORT = 8120
 BACKLOG = 5
+ASYNC_BACKLOG = 4096
 BUFFER_SIZE = 1024
+SHUTDOWN_TIMEOUT = 5
+
+log = logging.getLogger("caps_server")
 
-def run_server(port):
+def caps(message):
+    received_message = message.decode(errors="replace")
+    return received_message, received_message.upper()
+
+def run_server(port, framing="raw"):
     try:
         with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as server_sock:
             server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             server_sock.bind((HOST, port))
             server_sock.listen(BACKLOG)
-            print(f"Server started on [{HOST}]:{port}")
+            log.info("Server started on [%s]:%d", HOST, port)
 
             while True:
                 conn, addr = server_sock.accept()
                 with conn:
-                    print(f"Connected by {addr}")
+                    log.info("Connected by %s", addr)
+                    decoder = FrameDecoder(framing)
                     while True:
                         data = conn.recv(BUFFER_SIZE)
                         if not data:
                             break
-                        received_message = data.decode()
-                        response = received_message.upper().encode()
-                        
-                        print(f"Received from {addr}: {received_message}")
-                        print(f"Sending to {addr}: {received_message.upper()}")
-                        
-                        conn.sendall(response)
+                        try:
+                            messages = decoder.feed(data)
+                        except ValueError as e:
+                            log.warning("Dropping %s: %s", addr, e)
+                            break
+
+                        responses = []
+                        for message in messages:
+                            received_message, response = caps(message)
+                            # строки форматируются только если DEBUG действительно включён
+                            if log.isEnabledFor(logging.DEBUG):
+                                log.debug("Received from %s: %s", addr, received_message)
+                                log.debug("Sending to %s: %s", addr, response)
+                            responses.append(encode_frame(framing, response.encode()))
+
+                        if responses:
+                            conn.sendall(b''.join(responses))
+    except KeyboardInterrupt:
+        log.info("Server stopped")
     except Exception as e:
-        print(f"Server error: {e}")
+        log.error("Server error: %s", e)
         sys.exit(1)
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
+class CapsProtocol(asyncio.Protocol):
+    def __init__(self, connections, framing="raw"):
+        self.connections = connections
+        self.framing = framing
+        self.transport = None
+        self.addr = None
+        # многобайтовый символ UTF-8 может разрезаться между двумя recv
+        self.decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self.frames = FrameDecoder(framing)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info("peername")
+        self.connections.add(self)
+        log.info("Connected by %s", self.addr)
+
+    def data_received(self, data):
+        if self.framing == "raw":
+            received_message = self.decoder.decode(data)
+            response = received_message.upper()
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Received from %s: %s", self.addr, received_message)
+                log.debug("Sending to %s: %s", self.addr, response)
+            self.transport.write(response.encode())
+            return
+
         try:
-            port = int(sys.argv[1])
-        except ValueError:
-            print("Invalid port number. Using default port.")
-            port = DEFAULT_PORT
-    else:
+            messages = self.frames.feed(data)
+        except ValueError as e:
+            log.warning("Dropping %s: %s", self.addr, e)
+            self.transport.close()
+            return
+        # все кадры одного чтения (конвейер клиента) уходят одной записью
+        responses = []
+        for message in messages:
+            received_message, response = caps(message)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Received from %s: %s", self.addr, received_message)
+                log.debug("Sending to %s: %s", self.addr, response)
+            responses.append(encode_frame(self.framing, response.encode()))
+        if responses:
+            self.transport.write(b''.join(responses))
+
+    # медленный клиент не должен раздувать буфер отправки: перестаём его читать
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+    def connection_lost(self, exc):
+        self.connections.discard(self)
+        log.info("Disconnected %s", self.addr)
+
+async def serve_async(port, framing="raw"):
+    loop = asyncio.get_running_loop()
+    connections = set()
+    server = await loop.create_server(lambda: CapsProtocol(connections, framing), HOST, port,
+                                      family=socket.AF_INET6, reuse_address=True, backlog=ASYNC_BACKLOG)
+    log.info("Server started on [%s]:%d", HOST, port)
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    try:
+        await stop.wait()
+    finally:
+        # новых клиентов не принимаем, уже принятым даём дописать ответы
+        log.info("Shutting down, %d clients connected", len(connections))
+        server.close()
+        for conn in list(connections):
+            conn.transport.close()
+        deadline = loop.time() + SHUTDOWN_TIMEOUT
+        while connections and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        for conn in list(connections):
+            conn.transport.abort()
+        await server.wait_closed()
+        log.info("Server stopped")
+
+def run_async_server(port, framing="raw"):
+    try:
+        asyncio.run(serve_async(port, framing))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        log.error("Server error: %s", e)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IPv6 echo server that upper-cases messages")
+    parser.add_argument("port", nargs="?", default=str(DEFAULT_PORT))
+    parser.add_argument("--blocking", action="store_true",
+                        help="serve one client at a time (the original server)")
+    parser.add_argument("--framing", choices=FRAMINGS, default="raw",
+                        help="line: messages end with a newline, length: 4-byte length prefix, "
+                             "raw: every recv is one message")
+    parser.add_argument("--log-level", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="DEBUG prints every message, WARNING keeps the hot path silent")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(message)s")
+
+    try:
+        port = int(args.port)
+    except ValueError:
+        log.warning("Invalid port number. Using default port.")
         port = DEFAULT_PORT
-    
-    run_server(port)
+
+    if args.blocking:
+        run_server(port, args.framing)
+    else:
+        run_async_server(port, args.framing)
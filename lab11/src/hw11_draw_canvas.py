@@ -0,0 +1,99 @@
+from array import array
+from collections import deque
+
+from PySide6.QtWidgets import QWidget
+from PySide6.QtGui import QGuiApplication, QPainter, QPen, QPixmap, QPolygon
+from PySide6.QtCore import Qt, QPoint, QTimer
+
+DEFAULT_REFRESH_RATE = 60
+PEN_WIDTH = 3
+
+
+class StrokeCanvas(QWidget):
+    # Законченные штрихи один раз растрируются в pixmap, в paintEvent поверх него
+    # рисуются только текущие штрихи, поэтому время кадра не растёт со временем сессии.
+    # Законченные штрихи хранятся плоским массивом x, y, x, y...; stroke_ends - где
+    # кончается каждый. Всё это нужно только чтобы перерисовать pixmap после resize.
+    # Текущий штрих у каждого источника (своя мышь, удалённые участники) отдельный.
+    def __init__(self, color):
+        super().__init__()
+        self.pen = QPen(color, PEN_WIDTH)
+        self.points = array("i")
+        self.stroke_ends = array("I")
+        self.active = {}
+        self.backing = None
+        self.dirty = False
+        # пачки (source, x, y) из сетевых потоков; забираются в потоке GUI раз в кадр
+        self.incoming = deque()
+
+        # сколько бы точек ни пришло между кадрами, перерисовка одна на обновление экрана
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else DEFAULT_REFRESH_RATE
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setInterval(max(1, int(1000 / (refresh_rate or DEFAULT_REFRESH_RATE))))
+        self.frame_timer.timeout.connect(self.flush_frame)
+        self.frame_timer.start()
+
+    def add_point(self, x, y, source=0):
+        stroke = self.active.get(source)
+        if stroke is None:
+            stroke = self.active[source] = array("i")
+        stroke.extend((x, y))
+        self.dirty = True
+
+    def end_stroke(self, source=0):
+        stroke = self.active.pop(source, None)
+        if not stroke:
+            return
+        if self.backing is not None:
+            painter = QPainter(self.backing)
+            self.draw_stroke(painter, stroke)
+            painter.end()
+        self.points.extend(stroke)
+        self.stroke_ends.append(len(self.points))
+        self.dirty = True
+
+    def add_points(self, points):
+        for source, x, y in points:
+            if x is None:
+                self.end_stroke(source)
+            else:
+                self.add_point(x, y, source)
+
+    def flush_frame(self):
+        while self.incoming:
+            self.add_points(self.incoming.popleft())
+        if self.dirty:
+            self.dirty = False
+            self.update()
+
+    def draw_stroke(self, painter, points, start=0, end=None):
+        end = len(points) if end is None else end
+        if end - start < 4:
+            return
+        painter.setPen(self.pen)
+        painter.drawPolyline(QPolygon([QPoint(points[i], points[i + 1]) for i in range(start, end, 2)]))
+
+    def render_backing(self):
+        ratio = self.devicePixelRatioF()
+        self.backing = QPixmap(self.size() * ratio)
+        self.backing.setDevicePixelRatio(ratio)
+        self.backing.fill(Qt.transparent)
+        painter = QPainter(self.backing)
+        start = 0
+        for end in self.stroke_ends:
+            self.draw_stroke(painter, self.points, start, end)
+            start = end
+        painter.end()
+
+    def resizeEvent(self, event):
+        self.backing = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        if self.backing is None:
+            self.render_backing()
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.backing)
+        for stroke in self.active.values():
+            self.draw_stroke(painter, stroke)
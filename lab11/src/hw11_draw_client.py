@@ -1,48 +1,66 @@
 import sys
 import socket
-from PySide6.QtWidgets import QApplication, QWidget
-from PySide6.QtGui import QPainter, QPen, QMouseEvent
-from PySide6.QtCore import Qt, QPoint
+import threading
+from PySide6.QtWidgets import QApplication
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtCore import Qt, QPoint, QTimer
 
+from hw11_draw_canvas import StrokeCanvas
+from hw11_draw_protocol import FRAME_INTERVAL_MS, StrokeDecoder, StrokeEncoder
 
-class ClientCanvas(QWidget):
+
+class ClientCanvas(StrokeCanvas):
     def __init__(self, sock):
-        super().__init__()
+        super().__init__(Qt.blue)
         self.setWindowTitle("Client - Draw Here")
         self.setGeometry(100, 100, 800, 600)
         self.sock = sock
         self.drawing = False
-        self.points = []
+        # движения мыши копятся и отправляются раз в кадр, а не по sendall на точку
+        self.encoder = StrokeEncoder()
+        self.send_timer = QTimer(self)
+        self.send_timer.setInterval(FRAME_INTERVAL_MS)
+        self.send_timer.timeout.connect(self.flush_points)
+        self.send_timer.start()
 
     def mousePressEvent(self, event: QMouseEvent):
         if event.button() == Qt.LeftButton:
             self.drawing = True
-            self.points.append(event.position().toPoint())
             self.send_point(event.position().toPoint())
 
     def mouseMoveEvent(self, event: QMouseEvent):
         if self.drawing:
-            self.points.append(event.position().toPoint())
             self.send_point(event.position().toPoint())
-            self.update()
 
     def mouseReleaseEvent(self, event: QMouseEvent):
         self.drawing = False
-        self.points.append(None)
-        self.sock.sendall(b"NONE\n")
-        self.update()
+        self.end_stroke()
+        self.encoder.end()
+        self.flush_points()
 
     def send_point(self, point: QPoint):
-        message = f"{point.x()},{point.y()}\n".encode()
-        self.sock.sendall(message)
+        self.add_point(point.x(), point.y())
+        self.encoder.point(point.x(), point.y())
+
+    def flush_points(self):
+        data = self.encoder.take()
+        if data:
+            self.sock.sendall(data)
+
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        pen = QPen(Qt.blue, 3)
-        painter.setPen(pen)
-        for p1, p2 in zip(self.points, self.points[1:]):
-            if p1 and p2:
-                painter.drawLine(p1, p2)
+def receive_strokes(sock, canvas):
+    # штрихи остальных участников; свои рисуются сразу как источник 0,
+    # сервер нумерует клиентов с 1, так что источники не пересекаются
+    decoder = StrokeDecoder()
+    while True:
+        try:
+            points = decoder.recv(sock)
+        except OSError:
+            break
+        if points is None:
+            break
+        if points:
+            canvas.incoming.append(points)
 
 
 def connect_to_server():
@@ -56,4 +74,5 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     canvas = ClientCanvas(sock)
     canvas.show()
+    threading.Thread(target=receive_strokes, args=(sock, canvas), daemon=True).start()
     sys.exit(app.exec())
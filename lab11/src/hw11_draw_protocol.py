@@ -0,0 +1,94 @@
+import struct
+
+POINT = struct.Struct('!hh')
+STROKE_END = -32768
+COORD_LIMIT = 16383
+RECV_SIZE = 65536
+FRAME_INTERVAL_MS = 16
+
+# Двоичный протокол рисования: поток 4-байтовых записей (int16, int16).
+# Обычная запись - смещение (dx, dy) от предыдущей точки штриха; первая точка
+# штриха считается от (0, 0), то есть передаётся как есть. Запись
+# (STROKE_END, STROKE_END) закрывает штрих. Координаты ограничены ±COORD_LIMIT,
+# поэтому любое смещение помещается в int16 и не совпадает с маркером.
+# От сервера приходят штрихи нескольких участников вперемешку: запись
+# (STROKE_END, id) с id >= 0 переключает источник, состояние штриха у каждого своё.
+
+def source_marker(source):
+    return POINT.pack(STROKE_END, source)
+
+def clamp(value):
+    return max(-COORD_LIMIT, min(COORD_LIMIT, value))
+
+class StrokeEncoder:
+    # точки копятся между кадрами и уходят одним sendall
+    def __init__(self):
+        self.pending = bytearray()
+        self.x = 0
+        self.y = 0
+
+    def point(self, x, y):
+        x, y = clamp(x), clamp(y)
+        self.pending += POINT.pack(x - self.x, y - self.y)
+        self.x, self.y = x, y
+
+    def end(self):
+        self.pending += POINT.pack(STROKE_END, STROKE_END)
+        self.x = self.y = 0
+
+    def take(self):
+        data = bytes(self.pending)
+        self.pending.clear()
+        return data
+
+class StrokeDecoder:
+    # читает прямо в заранее выделенный bytearray и разбирает через memoryview,
+    # без промежуточных строк; хвост неполной записи переносится в начало буфера
+    def __init__(self, source=0, size=RECV_SIZE, keep_records=False):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.filled = 0
+        self.source = source
+        self.x = 0
+        self.y = 0
+        self.in_stroke = False
+        self.states = {}
+        # сервер пересылает записи дальше как есть, без повторного кодирования
+        self.keep_records = keep_records
+        self.records = b''
+
+    def recv(self, sock):
+        received = sock.recv_into(self.view[self.filled:])
+        if not received:
+            return None
+        self.filled += received
+        return self.decode()
+
+    def decode(self):
+        # (source, x, y) для точки и (source, None, None) для конца штриха
+        usable = self.filled - self.filled % POINT.size
+        if self.keep_records:
+            self.records = bytes(self.view[:usable])
+        points = []
+        source, x, y, in_stroke = self.source, self.x, self.y, self.in_stroke
+        for dx, dy in POINT.iter_unpack(self.view[:usable]):
+            if dx != STROKE_END:
+                x += dx
+                y += dy
+                in_stroke = True
+                points.append((source, x, y))
+            elif dy == STROKE_END:
+                points.append((source, None, None))
+                x = y = 0
+                in_stroke = False
+            else:
+                self.states[source] = (x, y, in_stroke)
+                source = dy
+                x, y, in_stroke = self.states.get(source, (0, 0, False))
+        self.source, self.x, self.y, self.in_stroke = source, x, y, in_stroke
+
+        rest = self.filled - usable
+        if rest:
+            self.view[:rest] = self.view[usable:self.filled]
+        self.filled = rest
+        return points
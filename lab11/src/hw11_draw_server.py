@@ -1,53 +1,160 @@
 import sys
 import socket
+import selectors
 import threading
-from PySide6.QtWidgets import QApplication, QWidget
-from PySide6.QtGui import QPainter, QPen
-from PySide6.QtCore import Qt, QPoint
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt
 
+from hw11_draw_canvas import StrokeCanvas
+from hw11_draw_protocol import POINT, STROKE_END, StrokeDecoder, source_marker
 
-class ServerCanvas(QWidget):
+PORT = 2570
+BACKLOG = 64
+MAX_SOURCE = 32767
+# выше HIGH_WATER перестаём читать от самого клиента, ниже LOW_WATER читаем снова;
+# кто отстал больше MAX_BUFFER, тот отключается и не тормозит остальных
+LOW_WATER = 64 * 1024
+HIGH_WATER = 256 * 1024
+MAX_BUFFER = 4 * 1024 * 1024
+
+
+class ServerCanvas(StrokeCanvas):
     def __init__(self):
-        super().__init__()
+        super().__init__(Qt.black)
         self.setWindowTitle("Server - Remote Drawing")
         self.setGeometry(100, 100, 800, 600)
-        self.points = []
-
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        pen = QPen(Qt.black, 3)
-        painter.setPen(pen)
-        for p1, p2 in zip(self.points, self.points[1:]):
-            if p1 and p2:
-                painter.drawLine(p1, p2)
-
-    def add_point(self, x, y):
-        self.points.append(QPoint(x, y))
-        self.update()
-
-
-def handle_client(conn, canvas):
-    buffer = ""
-    while True:
-        data = conn.recv(1024).decode()
-        if not data:
-            break
-        buffer += data
-        while "\n" in buffer:
-            line, buffer = buffer.split("\n", 1)
-            if line == "NONE":
-                canvas.points.append(None)
-            else:
-                x, y = map(int, line.strip().split(','))
-                canvas.add_point(x, y)
+
+
+class DrawClient:
+    def __init__(self, conn, addr, source):
+        self.conn = conn
+        self.addr = addr
+        self.source = source
+        self.decoder = StrokeDecoder(source, keep_records=True)
+        self.out = bytearray()
+        self.last_source = None
+        # от чьих штрихов клиент уже получил начало; пересылать середину штриха бессмысленно
+        self.synced = set()
+        self.paused = False
+
+
+class DrawServer:
+    # один сетевой поток на всех: selectors, неблокирующие сокеты, у каждого
+    # клиента свой буфер отправки
+    def __init__(self, canvas, port=PORT):
+        self.canvas = canvas
+        self.selector = selectors.DefaultSelector()
+        self.clients = {}
+        self.next_source = 0
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("0.0.0.0", port))
+        self.server.listen(BACKLOG)
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ)
+
+    def serve_forever(self):
+        while True:
+            for key, events in self.selector.select():
+                if key.fileobj is self.server:
+                    self.accept()
+                    continue
+                client = key.data
+                if client.conn.fileno() == -1:
+                    continue
+                if events & selectors.EVENT_READ:
+                    self.read(client)
+                if events & selectors.EVENT_WRITE and client.conn.fileno() != -1:
+                    self.write(client)
+
+    def accept(self):
+        try:
+            conn, addr = self.server.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.next_source = self.next_source % MAX_SOURCE + 1
+        client = DrawClient(conn, addr, self.next_source)
+        self.clients[conn] = client
+        self.selector.register(conn, selectors.EVENT_READ, client)
+        print(f"Connected by {addr}")
+
+    def read(self, client):
+        at_stroke_start = not client.decoder.in_stroke
+        try:
+            points = client.decoder.recv(client.conn)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            points = None
+        if points is None:
+            self.drop(client)
+            return
+        if not points:
+            return
+        self.canvas.incoming.append(points)
+        self.broadcast(client, client.decoder.records, at_stroke_start)
+
+    def broadcast(self, sender, records, at_stroke_start):
+        for client in list(self.clients.values()):
+            if client is sender:
+                continue
+            if sender.source not in client.synced:
+                if not at_stroke_start:
+                    continue
+                client.synced.add(sender.source)
+            self.forward(client, sender.source, records)
+
+    def forward(self, client, source, records):
+        if client.last_source != source:
+            client.out += source_marker(source)
+            client.last_source = source
+        client.out += records
+        if len(client.out) > MAX_BUFFER:
+            print(f"Dropping slow client {client.addr}")
+            self.drop(client)
+        else:
+            self.update_events(client)
+
+    def write(self, client):
+        try:
+            sent = client.conn.send(client.out)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self.drop(client)
+            return
+        del client.out[:sent]
+        self.update_events(client)
+
+    def update_events(self, client):
+        if client.paused and len(client.out) < LOW_WATER:
+            client.paused = False
+        elif not client.paused and len(client.out) > HIGH_WATER:
+            client.paused = True
+        events = 0 if client.paused else selectors.EVENT_READ
+        if client.out:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(client.conn, events, client)
+
+    def drop(self, client):
+        if self.clients.pop(client.conn, None) is None:
+            return
+        self.selector.unregister(client.conn)
+        client.conn.close()
+        # недорисованный штрих ушедшего клиента закрываем, чтобы он не висел активным
+        self.canvas.incoming.append([(client.source, None, None)])
+        for other in list(self.clients.values()):
+            if client.source in other.synced:
+                other.synced.discard(client.source)
+                self.forward(other, client.source, POINT.pack(STROKE_END, STROKE_END))
+        print(f"Disconnected {client.addr}")
 
 
 def start_server(canvas):
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(("0.0.0.0", 2570))
-    server.listen(1)
-    conn, addr = server.accept()
-    threading.Thread(target=handle_client, args=(conn, canvas), daemon=True).start()
+    DrawServer(canvas).serve_forever()
 
 
 if __name__ == "__main__":
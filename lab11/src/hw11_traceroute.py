@@ -1,28 +1,44 @@
+import argparse
+import json
+import math
+import os
+import queue
+import select
 import socket
 import struct
+import threading
 import time
 import sys
+from array import array
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lab10'))
+from inet_checksum import calculate_checksum
 
 ICMP_ECHO_REQUEST = 8
 ICMP_ECHO_REPLY = 0
+ICMP_DEST_UNREACHABLE = 3
 ICMP_TIME_EXCEEDED = 11
+UDP_BASE_PORT = 33434
+UDP_PAYLOAD = bytes(12)
+TCP_PORT = 80
+TCP_SYN = 0x02
+TCP_RST = 0x04
 TIMEOUT = 1
 CNT = 10
 PACKET_CNT = 5
-
-def bit_checksum(data):
-    K = 16
-    total_sum = 0
-    for i in range(0, len(data), 2):
-        word = (data[i] << 8) + (data[i+1] if i+1 < len(data) else 0)
-        total_sum += word
-    while total_sum >> K:
-        total_sum = (total_sum & 0xFFFF) + (total_sum >> K)
-    return total_sum & 0xFFFF
-
-def calculate_checksum(data):
-    raw_sum = bit_checksum(data)
-    return ~raw_sum & 0xFFFF
+WINDOW = CNT
+RECV_SIZE = 2048
+NS_PER_SEC = 1_000_000_000
+NS_PER_MS = 1_000_000
+RING_SIZE = 100
+MONITOR_INTERVAL = 1.0
+REPORT_INTERVAL = 10.0
+DNS_WORKERS = 8
+DNS_WAIT = 2
+POSITIVE_TTL = 3600
+NEGATIVE_TTL = 300
+NAME_CACHE_SIZE = 4096
 
 def create_icmp_packet(id, seq_num):
     header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, id, seq_num)
@@ -31,98 +47,629 @@ def create_icmp_packet(id, seq_num):
     header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum_val, id, seq_num)
     return header + data
 
-def send_packet(sock, packet, dest_addr, ttl):
+def send_packet(sock, packet, dest_addr, ttl, port=0):
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
-    start_time = time.time()
-    sock.sendto(packet, (dest_addr, 0))
+    start_time = time.monotonic_ns()
+    sock.sendto(packet, (dest_addr, port))
     return start_time
 
-def traceroute(host):
+def open_icmp_socket():
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.getprotobyname('icmp'))
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.getprotobyname('icmp'))
     except PermissionError:
         print("Error: ICMP messages can only be sent from root processes (add sudo).")
         sys.exit(1)
-        
+
+def resolve_host(host):
     try:
-        dest_addr = socket.gethostbyname(host)
+        return socket.gethostbyname(host)
     except socket.gaierror:
         print(f"Failed to get host address: {host}")
         sys.exit(1)
 
-    id = 25723
-    seq_num = 1
+def split_icmp_error(packet):
+    # (type, code, протокол, заголовок транспорта) исходного пакета, вложенного роутером
+    # в Time Exceeded / Destination Unreachable
+    if len(packet) < 20:
+        return None
+    ihl = (packet[0] & 0x0F) * 4
+    if len(packet) < ihl + 8:
+        return None
+    type, code = packet[ihl], packet[ihl + 1]
+    if type not in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACHABLE):
+        return None
+
+    inner = ihl + 8
+    if len(packet) < inner + 20:
+        return None
+    inner_transport = inner + (packet[inner] & 0x0F) * 4
+    if len(packet) < inner_transport + 8:
+        return None
+    return type, code, packet[inner + 9], packet[inner_transport:inner_transport + 8]
+
+def parse_icmp_reply(packet):
+    # возвращает (type, id, seq) нашего echo-запроса: из самого ответа или из копии
+    # заголовка, которую роутер вкладывает в сообщение об ошибке
+    if len(packet) < 20:
+        return None
+    ihl = (packet[0] & 0x0F) * 4
+    if len(packet) < ihl + 8:
+        return None
+    type, _, _, packet_id, seq = struct.unpack_from('!BBHHH', packet, ihl)
+    if type == ICMP_ECHO_REPLY:
+        return type, packet_id, seq
+
+    error = split_icmp_error(packet)
+    if error is None or error[2] != socket.IPPROTO_ICMP:
+        return None
+    inner_type, _, _, packet_id, seq = struct.unpack('!BBHHH', error[3])
+    if inner_type != ICMP_ECHO_REQUEST:
+        return None
+    return type, packet_id, seq
+
+def source_address(dest_addr):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect((dest_addr, UDP_BASE_PORT))
+        return s.getsockname()[0]
+
+# Методы зондирования. У каждого send(dest_addr, ttl, seq) -> (key, start_time)
+# и parse(packet, sock) -> (reached, key); ключ восстанавливается из ответа
+# или вложенного заголовка, всё остальное ядро трассировки у методов общее.
+
+class IcmpProbe:
+    name = "icmp"
+
+    def __init__(self):
+        self.sock = open_icmp_socket()
+        self.recv_socks = [self.sock]
+        self.id = os.getpid() & 0xFFFF
+
+    def send(self, dest_addr, ttl, seq):
+        start_time = send_packet(self.sock, create_icmp_packet(self.id, seq), dest_addr, ttl)
+        return (self.id, seq), start_time
+
+    def parse(self, packet, sock):
+        reply = parse_icmp_reply(packet)
+        if reply is None:
+            return None
+        type, packet_id, seq = reply
+        return type == ICMP_ECHO_REPLY, (packet_id, seq)
+
+    def close(self):
+        self.sock.close()
+
+class UdpProbe:
+    # классический traceroute: UDP на высокие порты, цель отвечает Port Unreachable
+    name = "udp"
+
+    def __init__(self, base_port=UDP_BASE_PORT):
+        self.base_port = base_port
+        self.icmp = open_icmp_socket()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("", 0))
+        self.src_port = self.sock.getsockname()[1]
+        self.recv_socks = [self.icmp]
+
+    def send(self, dest_addr, ttl, seq):
+        port = self.base_port + seq % (65536 - self.base_port)
+        start_time = send_packet(self.sock, UDP_PAYLOAD, dest_addr, ttl, port)
+        return (self.src_port, port), start_time
+
+    def parse(self, packet, sock):
+        error = split_icmp_error(packet)
+        if error is None or error[2] != socket.IPPROTO_UDP:
+            return None
+        src_port, dst_port = struct.unpack('!HH', error[3][:4])
+        if src_port != self.src_port:
+            return None
+        return error[0] == ICMP_DEST_UNREACHABLE, (src_port, dst_port)
+
+    def close(self):
+        self.sock.close()
+        self.icmp.close()
+
+class TcpSynProbe:
+    # SYN на открытый порт проходит там, где ICMP и UDP режут; цель отвечает SYN-ACK или RST
+    name = "tcp"
+
+    def __init__(self, port=TCP_PORT):
+        self.port = port
+        self.icmp = open_icmp_socket()
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        except PermissionError:
+            print("Error: raw TCP sockets can only be opened by root processes (add sudo).")
+            sys.exit(1)
+        self.src_port = 40000 + os.getpid() % 20000
+        self.id = os.getpid() & 0xFFFF
+        self.sources = {}
+        self.recv_socks = [self.icmp, self.sock]
+
+    def send(self, dest_addr, ttl, seq):
+        if dest_addr not in self.sources:
+            self.sources[dest_addr] = socket.inet_aton(source_address(dest_addr))
+        tcp_seq = (self.id << 16) | seq
+        header = struct.pack('!HHIIBBHHH', self.src_port, self.port, tcp_seq, 0, 5 << 4, TCP_SYN, 65535, 0, 0)
+        pseudo = self.sources[dest_addr] + socket.inet_aton(dest_addr) + struct.pack('!BBH', 0, socket.IPPROTO_TCP, len(header))
+        header = header[:16] + struct.pack('!H', calculate_checksum(pseudo + header)) + header[18:]
+        start_time = send_packet(self.sock, header, dest_addr, ttl)
+        return (self.src_port, tcp_seq), start_time
+
+    def parse(self, packet, sock):
+        if sock is self.sock:
+            ihl = (packet[0] & 0x0F) * 4
+            if len(packet) < ihl + 14:
+                return None
+            src_port, dst_port, _, ack, _, flags = struct.unpack_from('!HHIIBB', packet, ihl)
+            if src_port != self.port or dst_port != self.src_port or not flags & (TCP_SYN | TCP_RST):
+                return None
+            return True, (dst_port, (ack - 1) & 0xFFFFFFFF)
+
+        error = split_icmp_error(packet)
+        if error is None or error[2] != socket.IPPROTO_TCP:
+            return None
+        src_port, _, tcp_seq = struct.unpack('!HHI', error[3])
+        if src_port != self.src_port:
+            return None
+        return error[0] == ICMP_DEST_UNREACHABLE, (src_port, tcp_seq)
+
+    def close(self):
+        self.sock.close()
+        self.icmp.close()
+
+PROBE_METHODS = ("icmp", "udp", "tcp")
+
+def make_probe(method="icmp", port=None):
+    if method == "udp":
+        return UdpProbe(port or UDP_BASE_PORT)
+    if method == "tcp":
+        return TcpSynProbe(port or TCP_PORT)
+    return IcmpProbe()
+
+class ProbeRegistry:
+    # ключ метода -> отправленная проба; ответ находится по ключу из вложенного заголовка,
+    # поэтому порядок прихода ответов и соседние traceroute не важны
+    def __init__(self, method):
+        self.method = method
+        self.next_seq = 0
+        self.probes = {}
+
+    def send(self, dest_addr, ttl, probe, owner=None):
+        self.next_seq = (self.next_seq + 1) & 0xFFFF
+        key, start_time = self.method.send(dest_addr, ttl, self.next_seq)
+        self.probes.pop(key, None)
+        self.probes[key] = {"ttl": ttl, "probe": probe, "sent": start_time, "owner": owner}
+        return key
+
+    def recv(self, timeout):
+        ready, _, _ = select.select(self.method.recv_socks, [], [], timeout)
+        if not ready:
+            return None
+        sock = ready[0]
+        packet, addr = sock.recvfrom(RECV_SIZE)
+        return packet, addr[0], sock
+
+    def expire(self, timeout_ns):
+        # словарь упорядочен по времени отправки, старые пробы всегда в начале
+        cutoff = time.monotonic_ns() - timeout_ns
+        expired = []
+        for key, entry in self.probes.items():
+            if entry["sent"] > cutoff:
+                break
+            expired.append(key)
+        return [self.probes.pop(key) for key in expired]
+
+    def match(self, recv_packet, sock, end_time):
+        reply = self.method.parse(recv_packet, sock)
+        if reply is None:
+            return None
+        reached, key = reply
+        entry = self.probes.pop(key, None)
+        if entry is None:
+            return None
+        return reached, entry, (end_time - entry["sent"]) / NS_PER_MS
+
+    def close(self):
+        self.method.close()
+
+class HostnameResolver:
+    # PTR-запросы идут в фоновых потоках и никогда не блокируют отправку проб;
+    # LRU-кэш общий для всех целей и запусков внутри процесса
+    def __init__(self, workers=DNS_WORKERS, cache_size=NAME_CACHE_SIZE,
+                 positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL):
+        self.cache_size = cache_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.pending = set()
+        self.queue = queue.Queue()
+        self.workers = workers
+        self.started = False
+
+    def cached(self, addr):
+        # (True, name) если ответ известен (name=None - PTR нет), иначе (False, None)
+        with self.lock:
+            entry = self.cache.get(addr)
+            if entry is None or entry[1] < time.monotonic():
+                return False, None
+            self.cache.move_to_end(addr)
+            return True, entry[0]
+
+    def resolve(self, addr):
+        if self.cached(addr)[0]:
+            return
+        with self.lock:
+            if addr in self.pending:
+                return
+            self.pending.add(addr)
+            if not self.started:
+                self.started = True
+                for _ in range(self.workers):
+                    threading.Thread(target=self._worker, daemon=True).start()
+        self.queue.put(addr)
+
+    def wait(self, addrs, timeout=DNS_WAIT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not self.pending.intersection(addrs):
+                    return
+            time.sleep(0.02)
+
+    def _worker(self):
+        while True:
+            addr = self.queue.get()
+            try:
+                name = socket.gethostbyaddr(addr)[0]
+            except OSError:
+                name = None
+            ttl = self.positive_ttl if name else self.negative_ttl
+            with self.lock:
+                self.pending.discard(addr)
+                self.cache[addr] = (name, time.monotonic() + ttl)
+                self.cache.move_to_end(addr)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+resolver = HostnameResolver()
+
+def print_hop(ttl, ip_addr, rtt_list):
+    # возвращает False, если имя хопа ещё не известно и его надо допечатать позже
+    annotated = True
+    print(f"{ttl:2d}", end="  ")
+    if ip_addr:
+        known, hostname = resolver.cached(ip_addr)
+        if known:
+            print(f"{ip_addr} ({hostname or 'Unknown host'})", end="  ")
+        else:
+            resolver.resolve(ip_addr)
+            print(f"{ip_addr}", end="  ")
+            annotated = False
+
+        for rtt in rtt_list:
+            print(f"{rtt:.2f} ms" if rtt is not None else "*", end="  ")
+    else:
+        print("* * *", end="")
+
+    print()
+    return annotated
+
+def print_late_names(unnamed):
+    if not unnamed:
+        return
+    resolver.wait({ip_addr for _, ip_addr in unnamed})
+    print("\nHop names:")
+    for ttl, ip_addr in unnamed:
+        hostname = resolver.cached(ip_addr)[1]
+        print(f"{ttl:2d}  {ip_addr} ({hostname or 'Unknown host'})")
+
+def traceroute(host, max_hops=CNT, probes=PACKET_CNT, timeout=TIMEOUT, method="icmp", port=None):
+    dest_addr = resolve_host(host)
+    registry = ProbeRegistry(make_probe(method, port))
+    timeout_ns = int(timeout * NS_PER_SEC)
+    unnamed = []
 
     print(f"Traceroute to {host} [{dest_addr}]:")
 
-    for ttl in range(CNT):
+    dest_reached = False
+    for ttl in range(1, max_hops + 1):
         ip_addr = None
-        rtt_list = []
-        
-        print(f"{ttl + 1:2d}", end="  ")
-        
-        for _ in range(PACKET_CNT):
-            packet = create_icmp_packet(id, seq_num)
-            
+        rtt_list = [None] * probes
+
+        for probe in range(probes):
             try:
-                start_time = send_packet(sock, packet, dest_addr, ttl)
+                key = registry.send(dest_addr, ttl, probe)
             except socket.error as e:
                 print(f"Failed to send packet: {e}")
+                registry.close()
                 return
+            deadline = registry.probes[key]["sent"] + timeout_ns
 
-            sock.settimeout(TIMEOUT)
-            try:
-                while True:
-                    try:
-                        recv_packet, addr = sock.recvfrom(1024)
-                        end_time = time.time()
-                        
-                        icmp_header = recv_packet[20:28]
-                        type, _, _, packet_id, _ = struct.unpack('!BBHHH', icmp_header)
-                        
-                        if (type == ICMP_TIME_EXCEEDED or 
-                            (type == ICMP_ECHO_REPLY and packet_id == id)):
-                            current_addr = addr[0]
-                            if ip_addr is None:
-                                ip_addr = current_addr
-                            rtt = (end_time - start_time) * 1000
-                            rtt_list.append(rtt)
-                            break
-                    except socket.timeout:
-                        break
-            except socket.error:
-                pass
-
-            seq_num += 1
-            
-        if ip_addr:
-            try:
-                hostname = socket.gethostbyaddr(ip_addr)[0]
-            except socket.herror:
-                hostname = "Unknown host"
-            
-            print(f"{ip_addr} ({hostname})", end="  ")
-            
-            for rtt in rtt_list:
-                print(f"{rtt:.2f} ms", end="  ")
-            
-            for _ in range(PACKET_CNT - len(rtt_list)):
-                print("*", end="  ")
-        else:
-            print("* * *", end="")
-        
-        print() 
-        
-        if ip_addr == dest_addr:
+            while True:
+                remaining = deadline - time.monotonic_ns()
+                if remaining <= 0:
+                    break
+                try:
+                    received = registry.recv(remaining / NS_PER_SEC)
+                except socket.error:
+                    continue
+                if received is None:
+                    break
+
+                recv_packet, recv_addr, recv_sock = received
+                match = registry.match(recv_packet, recv_sock, time.monotonic_ns())
+                if match is None:
+                    continue
+                reached, entry, rtt = match
+                # запоздавший ответ на пробу прошлого хопа уже не нужен
+                if entry["ttl"] != ttl:
+                    continue
+                if ip_addr is None:
+                    ip_addr = recv_addr
+                    resolver.resolve(ip_addr)
+                if reached:
+                    dest_reached = True
+                rtt_list[entry["probe"]] = rtt
+                if entry["probe"] == probe:
+                    break
+
+        if not print_hop(ttl, ip_addr, rtt_list):
+            unnamed.append((ttl, ip_addr))
+
+        # UDP/TCP-цель может ответить и с другого адреса, поэтому смотрим на тип ответа
+        if dest_reached or ip_addr == dest_addr:
+            break
+
+    registry.close()
+    print_late_names(unnamed)
+    print("\nTraceroute completed.")
+
+def parallel_traceroute(host, max_hops=CNT, probes=PACKET_CNT, timeout=TIMEOUT, window=WINDOW,
+                        method="icmp", port=None):
+    dest_addr = resolve_host(host)
+    registry = ProbeRegistry(make_probe(method, port))
+    timeout_ns = int(timeout * NS_PER_SEC)
+
+    hops = [{"addr": None, "rtts": [None] * probes, "answered": 0, "deadline": None}
+            for _ in range(max_hops)]
+    dest_ttl = None
+    next_ttl = 1
+    printed = 0
+    unnamed = []
+
+    print(f"Traceroute to {host} [{dest_addr}]:")
+
+    # пробы всех TTL из окна уходят сразу, ответы сопоставляются через реестр по ключу метода
+    while True:
+        # пробы старше timeout забываем, опоздавший ответ на них уже ничего не изменит
+        registry.expire(timeout_ns)
+        while (next_ttl <= max_hops and next_ttl - printed <= window
+               and (dest_ttl is None or next_ttl <= dest_ttl)):
+            for probe in range(probes):
+                try:
+                    registry.send(dest_addr, next_ttl, probe)
+                except socket.error as e:
+                    print(f"Failed to send packet: {e}")
+                    registry.close()
+                    return
+            hops[next_ttl - 1]["deadline"] = time.monotonic_ns() + timeout_ns
+            next_ttl += 1
+
+        now = time.monotonic_ns()
+        last_ttl = min(dest_ttl or max_hops, next_ttl - 1)
+        while printed < last_ttl:
+            hop = hops[printed]
+            if hop["answered"] < probes and now < hop["deadline"]:
+                break
+            printed += 1
+            if not print_hop(printed, hop["addr"], hop["rtts"]):
+                unnamed.append((printed, hop["addr"]))
+
+        if printed >= (dest_ttl or max_hops):
             break
 
-    sock.close()
+        pending = [hop["deadline"] for hop in hops[printed:next_ttl - 1] if hop["answered"] < probes]
+        received = registry.recv(max(0.001, (min(pending) - now) / NS_PER_SEC) if pending else timeout)
+        if received is None:
+            continue
+
+        recv_packet, recv_addr, recv_sock = received
+        match = registry.match(recv_packet, recv_sock, time.monotonic_ns())
+        if match is None:
+            continue
+        reached, entry, rtt = match
+        # хоп уже напечатан - ответ на него, даже от цели, ничего не меняет
+        if entry["ttl"] <= printed:
+            continue
+        hop = hops[entry["ttl"] - 1]
+        if hop["addr"] is None:
+            hop["addr"] = recv_addr
+            resolver.resolve(recv_addr)
+        hop["rtts"][entry["probe"]] = rtt
+        hop["answered"] += 1
+        if reached and (dest_ttl is None or entry["ttl"] < dest_ttl):
+            dest_ttl = entry["ttl"]
+
+    registry.close()
+    print_late_names(unnamed)
     print("\nTraceroute completed.")
 
+class HopRing:
+    # последние size проб хопа; потеря хранится как NaN, память не растёт
+    def __init__(self, size=RING_SIZE):
+        self.samples = array('d', [math.nan] * size)
+        self.size = size
+        self.index = 0
+        self.filled = 0
+        self.addr = None
+        self.changes = 0
+
+    def record(self, rtt):
+        self.samples[self.index] = rtt
+        self.index = (self.index + 1) % self.size
+        self.filled = min(self.filled + 1, self.size)
+
+    def summary(self, ttl):
+        rtts = sorted(rtt for rtt in self.samples[:self.filled] if not math.isnan(rtt))
+        last = self.samples[self.index - 1] if self.filled else math.nan
+
+        def percentile(p):
+            if not rtts:
+                return None
+            return round(rtts[max(0, math.ceil(p / 100 * len(rtts)) - 1)], 3)
+
+        return {
+            "ttl": ttl,
+            "addr": self.addr,
+            "name": resolver.cached(self.addr)[1] if self.addr else None,
+            "samples": self.filled,
+            "loss": round((self.filled - len(rtts)) / self.filled * 100, 1) if self.filled else None,
+            "last": None if math.isnan(last) else round(last, 3),
+            "p50": percentile(50),
+            "p90": percentile(90),
+            "p99": percentile(99),
+            "route_changes": self.changes,
+        }
+
+def emit(record):
+    print(json.dumps(record), flush=True)
+
+def monitor(hosts, max_hops=CNT, interval=MONITOR_INTERVAL, timeout=TIMEOUT,
+            report_interval=REPORT_INTERVAL, ring_size=RING_SIZE, method="icmp", port=None):
+    registry = ProbeRegistry(make_probe(method, port))
+    timeout_ns = int(timeout * NS_PER_SEC)
+    interval_ns = int(interval * NS_PER_SEC)
+    report_ns = int(report_interval * NS_PER_SEC)
+
+    targets = []
+    for host in hosts:
+        try:
+            addr = socket.gethostbyname(host)
+        except socket.gaierror:
+            print(f"Failed to get host address: {host}", file=sys.stderr)
+            continue
+        targets.append({"host": host, "addr": addr, "dest_ttl": None,
+                        "hops": [HopRing(ring_size) for _ in range(max_hops)]})
+    if not targets:
+        registry.close()
+        return
+
+    def report():
+        for target in targets:
+            last_ttl = target["dest_ttl"] or max_hops
+            emit({
+                "event": "summary",
+                "time": round(time.time(), 3),
+                "target": target["host"],
+                "addr": target["addr"],
+                "reached": target["dest_ttl"] is not None,
+                "hops": [hop.summary(ttl) for ttl, hop in enumerate(target["hops"][:last_ttl], 1)],
+            })
+
+    def handle(recv_packet, addr, recv_sock):
+        match = registry.match(recv_packet, recv_sock, time.monotonic_ns())
+        if match is None or match[1]["owner"] is None:
+            return
+        reached, entry, rtt = match
+        target, ttl = entry["owner"], entry["ttl"]
+        hop = target["hops"][ttl - 1]
+        if hop.addr is not None and hop.addr != addr:
+            hop.changes += 1
+            emit({"event": "route_change", "time": round(time.time(), 3), "target": target["host"],
+                  "ttl": ttl, "old": hop.addr, "new": addr})
+        if hop.addr != addr:
+            resolver.resolve(addr)
+        hop.addr = addr
+        hop.record(rtt)
+
+        if reached:
+            if target["dest_ttl"] is None or ttl < target["dest_ttl"]:
+                target["dest_ttl"] = ttl
+        elif ttl == target["dest_ttl"]:
+            # цель перестала отвечать на прежнем TTL - путь удлинился, ищем заново
+            target["dest_ttl"] = None
+
+    def serve(until, next_report):
+        while True:
+            for entry in registry.expire(timeout_ns):
+                if entry["owner"] is not None:
+                    entry["owner"]["hops"][entry["ttl"] - 1].record(math.nan)
+
+            now = time.monotonic_ns()
+            if now >= next_report:
+                report()
+                next_report = now + report_ns
+            if now >= until:
+                return next_report
+
+            received = registry.recv(max(0.0001, (min(until, next_report) - now) / NS_PER_SEC))
+            if received is not None:
+                handle(*received)
+
+    next_send = time.monotonic_ns()
+    next_report = next_send + report_ns
+    try:
+        while True:
+            # пробы цикла равномерно размазаны по interval, чтобы не упираться в rate limit роутеров
+            batch = [(target, ttl) for target in targets
+                     for ttl in range(1, (target["dest_ttl"] or max_hops) + 1)]
+            spacing = interval_ns // len(batch)
+            for target, ttl in batch:
+                next_report = serve(next_send, next_report)
+                next_send += spacing
+                try:
+                    registry.send(target["addr"], ttl, 0, target)
+                except socket.error as e:
+                    print(f"Failed to send packet to {target['host']}: {e}", file=sys.stderr)
+    except KeyboardInterrupt:
+        report()
+    finally:
+        registry.close()
+
+def read_hosts(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="ICMP, UDP or TCP SYN traceroute")
+    parser.add_argument("hosts", nargs="*", help="target host (several hosts in --monitor mode)")
+    parser.add_argument("-f", "--file", help="read monitor targets from a file, one per line")
+    parser.add_argument("-p", "--parallel", action="store_true",
+                        help="probe all TTLs at once instead of hop by hop")
+    parser.add_argument("-M", "--monitor", action="store_true",
+                        help="keep probing the targets and print JSON summaries (mtr-style)")
+    parser.add_argument("-P", "--method", choices=PROBE_METHODS, default="icmp",
+                        help="probe type: ICMP echo, UDP to high ports or TCP SYN")
+    parser.add_argument("--port", type=int,
+                        help=f"destination port: base port for udp (default {UDP_BASE_PORT}), "
+                             f"target port for tcp (default {TCP_PORT})")
+    parser.add_argument("-m", "--max-hops", type=int, default=CNT)
+    parser.add_argument("-q", "--probes", type=int, default=PACKET_CNT, help="probes per hop")
+    parser.add_argument("-w", "--window", type=int, default=WINDOW,
+                        help="TTLs in flight at once in parallel mode")
+    parser.add_argument("-t", "--timeout", type=float, default=TIMEOUT)
+    parser.add_argument("-i", "--interval", type=float, default=MONITOR_INTERVAL,
+                        help="seconds per probing cycle over all targets in monitor mode")
+    parser.add_argument("-r", "--report-interval", type=float, default=REPORT_INTERVAL,
+                        help="seconds between JSON summaries in monitor mode")
+    parser.add_argument("--ring-size", type=int, default=RING_SIZE,
+                        help="samples kept per hop in monitor mode")
+    args = parser.parse_args()
 
-    target_host = sys.argv[1]
+    hosts = list(args.hosts)
+    if args.file:
+        hosts += read_hosts(args.file)
+    if not hosts:
+        parser.error("no target host given")
 
-    traceroute(target_host)
\ No newline at end of file
+    if args.monitor:
+        monitor(hosts, args.max_hops, args.interval, args.timeout, args.report_interval, args.ring_size,
+                args.method, args.port)
+    elif len(hosts) > 1:
+        parser.error("several hosts are only supported in --monitor mode")
+    elif args.parallel:
+        parallel_traceroute(hosts[0], args.max_hops, args.probes, args.timeout, args.window,
+                            args.method, args.port)
+    else:
+        traceroute(hosts[0], args.max_hops, args.probes, args.timeout, args.method, args.port)
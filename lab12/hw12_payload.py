@@ -0,0 +1,44 @@
+import os
+import struct
+import time
+
+PACKET_SIZE = 1024
+HEADER = struct.Struct('!Id')
+HEADER_SIZE = HEADER.size
+BATCH = 64
+POOL_SIZE = 1 << 20
+POOL_STEP = 4099
+
+# Полезная нагрузка для отправителей lab12. Случайные байты генерируются один раз
+# (os.urandom), дальше на каждую пачку пакетов - одно копирование куска пула в
+# готовый bytearray и struct.pack_into заголовков (номер, время) на свои места.
+# Наружу отдаются memoryview на этот же буфер, так что в цикле отправки нет ни
+# генерации байт в Python, ни склейки header + data.
+
+class PacketBatch:
+    def __init__(self, packet_size=PACKET_SIZE, batch=BATCH, pool_size=POOL_SIZE):
+        if packet_size < HEADER_SIZE:
+            raise ValueError(f"packet size must be at least {HEADER_SIZE} bytes")
+        self.packet_size = packet_size
+        self.batch = batch
+        self.pool_size = pool_size
+        self.pool = memoryview(os.urandom(pool_size + packet_size * batch))
+        self.offset = 0
+        self.buffer = bytearray(packet_size * batch)
+        self.view = memoryview(self.buffer)
+
+    def fill(self, first_seq, count=None):
+        count = self.batch if count is None else min(count, self.batch)
+        size = count * self.packet_size
+        self.view[:size] = self.pool[self.offset:self.offset + size]
+        self.offset = (self.offset + POOL_STEP) % self.pool_size
+        timestamp = time.time()
+        for i in range(count):
+            HEADER.pack_into(self.buffer, i * self.packet_size, (first_seq + i) & 0xFFFFFFFF, timestamp)
+        return self.view[:size]
+
+    def batches(self, total):
+        # (номер первого пакета, сколько пакетов, memoryview на них) до total пакетов
+        for first_seq in range(0, total, self.batch):
+            count = min(self.batch, total - first_seq)
+            yield first_seq, count, self.fill(first_seq, count)
@@ -0,0 +1,151 @@
+import socket
+import threading
+import time
+from collections import deque
+
+from PySide6.QtWidgets import QPushButton, QWidget
+from PySide6.QtGui import QPainter, QPen, QPolygonF
+from PySide6.QtCore import Qt, QPointF, QThread, Signal
+
+REPORT_INTERVAL = 0.25
+POLL_INTERVAL = 0.2
+GRAPH_SAMPLES = 120
+
+# Передача идёт в отдельном QThread, окно получает только сигналы. Прогресс
+# отправляется не чаще REPORT_INTERVAL, поэтому цикл передачи не платит за
+# перерисовку интерфейса, а окно не замирает даже на многоминутном тесте.
+
+class TransferThread(QThread):
+    progress = Signal(int, int)
+    status = Signal(str)
+    result = Signal(dict)
+
+    def __init__(self, engine, *args):
+        super().__init__()
+        self.engine = engine
+        self.args = args
+        self.stop_event = threading.Event()
+        self.sockets = []
+        self.last_report = 0.0
+
+    @property
+    def cancelled(self):
+        return self.stop_event.is_set()
+
+    def run(self):
+        try:
+            result = self.engine(self, *self.args)
+        except Exception as e:
+            if not self.cancelled:
+                self.status.emit(f"Error: {e}")
+                return
+            result = None
+        if self.cancelled:
+            self.status.emit("Cancelled.")
+        if result is not None:
+            self.result.emit(result)
+
+    def report(self, packets, nbytes, force=False):
+        now = time.monotonic()
+        if force or now - self.last_report >= REPORT_INTERVAL:
+            self.last_report = now
+            self.progress.emit(packets, nbytes)
+
+    def watch(self, sock):
+        # заблокированный в send/recv поток будится закрытием его сокета
+        self.sockets.append(sock)
+        return sock
+
+    def cancel(self):
+        self.stop_event.set()
+        for sock in self.sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class ThroughputGraph(QWidget):
+    # скорость по последним GRAPH_SAMPLES отчётам потока передачи
+    def __init__(self):
+        super().__init__()
+        self.setMinimumHeight(120)
+        self.samples = deque(maxlen=GRAPH_SAMPLES)
+        self.last = None
+
+    def reset(self):
+        self.samples.clear()
+        self.last = None
+        self.update()
+
+    def add_progress(self, packets, nbytes):
+        now = time.monotonic()
+        if self.last is not None:
+            last_time, last_bytes = self.last
+            if now > last_time:
+                self.samples.append((nbytes - last_bytes) / (now - last_time))
+        self.last = (now, nbytes)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        width, height = self.width(), self.height()
+        current = self.samples[-1] if self.samples else 0
+        painter.drawText(6, 16, f"{current * 8 / 1e6:.1f} Mbit/s ({current / 1024:.0f} KB/s)")
+        if len(self.samples) < 2:
+            return
+        top = max(self.samples) or 1
+        step = width / (GRAPH_SAMPLES - 1)
+        offset = GRAPH_SAMPLES - len(self.samples)
+        polygon = QPolygonF([QPointF((offset + i) * step, height - 2 - value / top * (height - 24))
+                             for i, value in enumerate(self.samples)])
+        painter.setPen(QPen(Qt.darkGreen, 2))
+        painter.drawPolyline(polygon)
+
+
+class TransferWindow(QWidget):
+    # общая часть окон lab12: кнопки старта и отмены, график скорости, поток передачи
+    def add_transfer_controls(self, layout, start_text):
+        self.worker = None
+        self.graph = ThroughputGraph()
+        self.start_button = QPushButton(start_text)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.start_button.clicked.connect(self.start_transfer)
+        self.cancel_button.clicked.connect(self.cancel_transfer)
+        layout.addWidget(self.graph)
+        layout.addWidget(self.start_button)
+        layout.addWidget(self.cancel_button)
+
+    def run_transfer(self, engine, *args):
+        self.graph.reset()
+        self.worker = TransferThread(engine, *args)
+        self.worker.status.connect(self.cur_log.setText)
+        self.worker.progress.connect(self.graph.add_progress)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.result.connect(self.show_result)
+        self.worker.finished.connect(self.transfer_finished)
+        self.start_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.worker.start()
+
+    def cancel_transfer(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def transfer_finished(self):
+        self.start_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+    def show_progress(self, packets, nbytes):
+        pass
+
+    def show_result(self, result):
+        pass
+
+    def closeEvent(self, event):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+        event.accept()
@@ -0,0 +1,140 @@
+import socket
+import struct
+import time
+
+from hw12_payload import HEADER, HEADER_SIZE
+
+SOL_UDP = getattr(socket, "SOL_UDP", 17)
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103)
+UDP_GRO = getattr(socket, "UDP_GRO", 104)
+MAX_UDP_PAYLOAD = 65507
+MAX_GSO_SEGMENTS = 64
+GRO_BUFFER = 1 << 16
+PACING_QUANTUM = 0.001
+PACING_BURST = 0.02
+# на сколько номеров вперёд от максимального растёт bitmap; дальше - чужой или битый пакет
+MARK_WINDOW = 1 << 20
+NS_PER_SEC = 1_000_000_000
+
+# Пакетный UDP для lab12. В Python нет sendmmsg/recvmmsg, поэтому на Linux
+# используется сегментация в ядре: UDP_SEGMENT (GSO) режет один большой sendto
+# на пакеты по packet_size, UDP_GRO склеивает пришедшие датаграммы в один
+# recvmsg и сообщает размер сегмента. Где этого нет, остаётся sendto/recv_into
+# на каждый пакет из тех же заранее выделенных буферов.
+
+def mbit_to_pps(mbit, packet_size):
+    return mbit * 1_000_000 / 8 / packet_size
+
+def set_buffer(sock, option, size):
+    # 0 - оставить системное значение; ядро может ограничить запрошенное (rmem_max/wmem_max)
+    if size:
+        sock.setsockopt(socket.SOL_SOCKET, option, size)
+    return sock.getsockopt(socket.SOL_SOCKET, option)
+
+class TokenBucket:
+    # rate пакетов в секунду, не больше burst пакетов подряд; rate 0 - без ограничения
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.last = time.monotonic_ns()
+
+    def wait(self, count):
+        if not self.rate:
+            return
+        while True:
+            now = time.monotonic_ns()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate / NS_PER_SEC)
+            self.last = now
+            if self.tokens >= count:
+                self.tokens -= count
+                return
+            time.sleep((count - self.tokens) / self.rate)
+
+class BatchSender:
+    def __init__(self, sock, addr, packet_size):
+        self.sock = sock
+        self.addr = addr
+        self.packet_size = packet_size
+        self.batch = min(MAX_GSO_SEGMENTS, MAX_UDP_PAYLOAD // packet_size)
+        self.gso = False
+        if self.batch > 1:
+            try:
+                sock.setsockopt(SOL_UDP, UDP_SEGMENT, packet_size)
+                self.gso = True
+            except OSError:
+                pass
+        if not self.gso:
+            self.batch = MAX_GSO_SEGMENTS
+
+    def send(self, view, count):
+        if self.gso:
+            try:
+                self.sock.sendto(view[:count * self.packet_size], self.addr)
+                return
+            except OSError:
+                # сетевая карта без сегментации (EIO и т.п.) - дальше по одному пакету
+                self.sock.setsockopt(SOL_UDP, UDP_SEGMENT, 0)
+                self.gso = False
+        size = self.packet_size
+        for offset in range(0, count * size, size):
+            self.sock.sendto(view[offset:offset + size], self.addr)
+
+class BatchReceiver:
+    def __init__(self, sock, packet_size):
+        self.sock = sock
+        self.packet_size = packet_size
+        self.gro = False
+        try:
+            sock.setsockopt(SOL_UDP, UDP_GRO, 1)
+            self.gro = True
+        except OSError:
+            pass
+        self.buffer = bytearray(GRO_BUFFER if self.gro else packet_size)
+        self.view = memoryview(self.buffer)
+        self.ancillary = socket.CMSG_SPACE(struct.calcsize("i"))
+        self.seen = bytearray()
+        self.count = 0
+        self.unique = 0
+        self.stray = 0
+        self.max_packet = -1
+
+    def recv(self):
+        # один системный вызов; возвращает, сколько пакетов в нём пришло
+        if self.gro:
+            received, ancdata, _, _ = self.sock.recvmsg_into([self.view], self.ancillary)
+            segment = received
+            for level, kind, data in ancdata:
+                if level == SOL_UDP and kind == UDP_GRO:
+                    segment, = struct.unpack("i", data[:struct.calcsize("i")])
+        else:
+            received = self.sock.recv_into(self.view)
+            segment = received
+
+        packets = 0
+        for offset in range(0, received, segment or 1):
+            if received - offset < HEADER_SIZE:
+                continue
+            pkt_num, pkt_time = HEADER.unpack_from(self.buffer, offset)
+            self.mark(pkt_num)
+            packets += 1
+        self.count += packets
+        return packets
+
+    def mark(self, pkt_num):
+        # bytearray-флаги вместо set: повторы не считаются, память - байт на номер.
+        # Номер берётся из любой датаграммы на порт, поэтому далёкий скачок вперёд
+        # не раздувает bitmap, а считается отдельно и в потери не входит
+        if pkt_num > self.max_packet + MARK_WINDOW:
+            self.stray += 1
+            return
+        if pkt_num >= len(self.seen):
+            self.seen.extend(bytes(max(pkt_num + 1 - len(self.seen), len(self.seen))))
+        if not self.seen[pkt_num]:
+            self.seen[pkt_num] = 1
+            self.unique += 1
+        if pkt_num > self.max_packet:
+            self.max_packet = pkt_num
+
+    def lost(self):
+        return self.max_packet + 1 - self.unique
@@ -1,11 +1,39 @@
+import os
 import sys
 import socket
-import random
-import struct
-import time
-from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton
+from PySide6.QtWidgets import QApplication, QVBoxLayout, QLabel, QLineEdit
 
-class TCPSender(QWidget):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hw12_payload import PACKET_SIZE, PacketBatch
+from hw12_transfer import TransferWindow
+
+def send_packets(worker, ip, port, count):
+    packets = PacketBatch(PACKET_SIZE)
+
+    worker.status.emit(f"Connecting to {ip}:{port}...")
+
+    try:
+        with worker.watch(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
+            s.connect((ip, port))
+            worker.status.emit("Connected. Starting transmission...")
+            total = 0
+            # поток TCP всё равно склеит пакеты, поэтому пачка уходит одним sendall
+            for first, sent, data in packets.batches(count):
+                if worker.cancelled:
+                    break
+                s.sendall(data)
+                total = first + sent
+                worker.report(total, total * PACKET_SIZE)
+            worker.report(total, total * PACKET_SIZE, force=True)
+    except OSError as e:
+        if not worker.cancelled:
+            worker.status.emit(f"Error (pls click start listening button in receiver): {e}")
+        return None
+    if not worker.cancelled:
+        worker.status.emit("Transmission complete.")
+    return None
+
+class TCPSender(TransferWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("TCP Sender")
@@ -15,8 +43,8 @@ class TCPSender(QWidget):
         self.port = QLineEdit("8080")
         self.num_of_packets = QLineEdit("5")
         self.cur_log = QLabel("Waiting to start...")
+        self.sent = QLabel("Packets sent:")
 
-        self.send_button = QPushButton("Send")
         layout.addWidget(QLabel("Receiver IP"))
         layout.addWidget(self.ip)
         layout.addWidget(QLabel("Receiver Port"))
@@ -24,35 +52,22 @@ class TCPSender(QWidget):
         layout.addWidget(QLabel("Number of packets"))
         layout.addWidget(self.num_of_packets)
         layout.addWidget(self.cur_log)
-        layout.addWidget(self.send_button)
+        layout.addWidget(self.sent)
+        self.add_transfer_controls(layout, "Send")
 
-        self.send_button.clicked.connect(self.send_data)
         self.setLayout(layout)
 
-    def send_data(self):
-        ip = self.ip.text()
-        port = int(self.port.text())
-        count = int(self.num_of_packets.text())
-        packet_size = 1024
-        header_size = 12
-        data_size = packet_size - header_size
-
-        self.cur_log.setText(f"Connecting to {ip}:{port}...")
-
+    def start_transfer(self):
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((ip, port))
-                self.cur_log.setText("Connected. Starting transmission...")
-                for i in range(count):
-                    timestamp = time.time()
-                    random_data = bytes([random.randint(0, 255) for _ in range(data_size)])
-                    header = struct.pack('!Id', i, timestamp)
-                    packet = header + random_data
-                    s.sendall(packet)
-                    self.cur_log.setText(f"Sent packet {i + 1} of {count}")
-                self.cur_log.setText("Transmission complete.")
-        except Exception as e:
-            self.cur_log.setText(f"Error (pls click start listening button in receiver): {e}")
+            port = int(self.port.text())
+            self.count = int(self.num_of_packets.text())
+        except ValueError as e:
+            self.cur_log.setText(f"Error: {e}")
+            return
+        self.run_transfer(send_packets, self.ip.text(), port, self.count)
+
+    def show_progress(self, packets, nbytes):
+        self.sent.setText(f"Packets sent: {packets} of {self.count}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
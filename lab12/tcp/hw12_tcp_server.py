@@ -1,10 +1,78 @@
+import os
 import sys
 import socket
-import struct
 import time
-from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton
+from PySide6.QtWidgets import QApplication, QVBoxLayout, QLabel, QLineEdit
 
-class TCPReceiver(QWidget):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hw12_payload import HEADER, PACKET_SIZE
+from hw12_transfer import POLL_INTERVAL, TransferWindow
+
+READ_SIZE = 1 << 20
+
+def receive_packets(worker, ip, port, read_size=READ_SIZE):
+    packet_size = PACKET_SIZE
+
+    worker.status.emit("Waiting for connection...")
+
+    with worker.watch(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((ip, port))
+        s.listen(1)
+        s.settimeout(POLL_INTERVAL)
+        while True:
+            if worker.cancelled:
+                return None
+            try:
+                conn, addr = s.accept()
+                break
+            except socket.timeout:
+                continue
+        conn.settimeout(None)
+        worker.status.emit(f"Client connected: {addr}")
+
+        with worker.watch(conn):
+            # читаем сразу в заранее выделенный буфер и разбираем заголовки по смещениям;
+            # неполный пакет в конце переносится в начало, остальное не копируется
+            buffer = bytearray(read_size + packet_size)
+            view = memoryview(buffer)
+            filled = 0
+            max_packet = -1
+            count = 0
+            start = time.time()
+
+            while not worker.cancelled:
+                received = conn.recv_into(view[filled:filled + read_size])
+                if not received:
+                    break
+                filled += received
+                end = filled - filled % packet_size
+
+                for offset in range(0, end, packet_size):
+                    pkt_num, pkt_time = HEADER.unpack_from(buffer, offset)
+                    if pkt_num > max_packet:
+                        max_packet = pkt_num
+                count += end // packet_size
+
+                rest = filled - end
+                if rest:
+                    view[:rest] = view[end:filled]
+                filled = rest
+                worker.report(count, count * packet_size)
+
+            worker.report(count, count * packet_size, force=True)
+            end = time.time()
+            elapsed = end - start if end > start else 1
+            speed = (count * packet_size) / elapsed / 1024
+
+            # TCP не теряет и не дублирует, так что потерянные - это просто недошедший хвост номеров
+            lost = max_packet + 1 - count if count else 0
+
+    if not worker.cancelled:
+        worker.status.emit("Reception complete.")
+    return {"speed": speed, "count": count, "lost": lost}
+
+class TCPReceiver(TransferWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("TCP Receiver")
@@ -12,80 +80,42 @@ class TCPReceiver(QWidget):
 
         self.ip = QLineEdit("127.0.0.1")
         self.port = QLineEdit("8080")
+        self.read_size = QLineEdit(str(READ_SIZE))
         self.cur_log = QLabel("Waiting to start...")
         self.speed = QLabel("Speed:")
         self.received = QLabel("Packets received:")
         self.lost = QLabel("Packets lost:")
 
-        self.receive_button = QPushButton("Start Listening")
         layout.addWidget(QLabel("IP"))
         layout.addWidget(self.ip)
         layout.addWidget(QLabel("Port"))
         layout.addWidget(self.port)
+        layout.addWidget(QLabel("Read size, bytes"))
+        layout.addWidget(self.read_size)
         layout.addWidget(self.cur_log)
         layout.addWidget(self.speed)
         layout.addWidget(self.received)
         layout.addWidget(self.lost)
-        layout.addWidget(self.receive_button)
+        self.add_transfer_controls(layout, "Start Listening")
 
-        self.receive_button.clicked.connect(self.receive_data)
         self.setLayout(layout)
 
-    def receive_data(self):
-        ip = self.ip.text()
-        port = int(self.port.text())
-        packet_size = 1024
-        header_size = 12
-
-        self.cur_log.setText("Waiting for connection...")
-
+    def start_transfer(self):
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind((ip, port))
-                s.listen(1)
-                conn, addr = s.accept()
-                self.cur_log.setText(f"Client connected: {addr}")
-
-                with conn:
-                    buffer = b""
-                    received_packets = set()
-                    count = 0
-                    start = time.time()
-
-                    while True:
-                        data = conn.recv(4096)
-                        if not data:
-                            break
-                        buffer += data
-
-                        while len(buffer) >= packet_size:
-                            packet = buffer[:packet_size]
-                            buffer = buffer[packet_size:]
-
-                            if len(packet) < header_size:
-                                continue
-
-                            pkt_num, pkt_time = struct.unpack('!Id', packet[:header_size])
-                            received_packets.add(pkt_num)
-                            count += 1
-                            self.cur_log.setText(f"Packets received: {count}")
-
-                    end = time.time()
-                    elapsed = end - start if end > start else 1
-                    speed = (count * packet_size) / elapsed / 1024
-
-                    if received_packets:
-                        max_packet = max(received_packets)
-                        lost = max_packet + 1 - len(received_packets)
-                    else:
-                        lost = 0
-
-                    self.speed.setText(f"Speed: {speed:.2f} KB/s")
-                    self.received.setText(f"Packets received: {count}")
-                    self.lost.setText(f"Packets lost: {lost}")
-                    self.cur_log.setText("Reception complete.")
-        except Exception as e:
+            port = int(self.port.text())
+            read_size = max(PACKET_SIZE, int(self.read_size.text()))
+        except ValueError as e:
             self.cur_log.setText(f"Error: {e}")
+            return
+        self.run_transfer(receive_packets, self.ip.text(), port, read_size)
+
+    def show_progress(self, packets, nbytes):
+        self.received.setText(f"Packets received: {packets}")
+
+    def show_result(self, result):
+        self.speed.setText(f"Speed: {result['speed']:.2f} KB/s")
+        self.received.setText(f"Packets received: {result['count']}")
+        self.lost.setText(f"Packets lost: {result['lost']}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
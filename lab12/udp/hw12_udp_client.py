@@ -1,11 +1,48 @@
+import os
 import sys
 import socket
-import random
-import struct
-import time
-from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton
+from PySide6.QtWidgets import QApplication, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox
 
-class UDPSender(QWidget):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hw12_payload import PACKET_SIZE, PacketBatch
+from hw12_transfer import TransferWindow
+from hw12_udp_engine import PACING_BURST, PACING_QUANTUM, BatchSender, TokenBucket, mbit_to_pps, set_buffer
+
+def send_packets(worker, ip, port, count, rate=0, sndbuf=0):
+    worker.status.emit(f"Sending UDP packets to {ip}:{port}...")
+
+    try:
+        with worker.watch(socket.socket(socket.AF_INET, socket.SOCK_DGRAM)) as s:
+            sndbuf = set_buffer(s, socket.SO_SNDBUF, sndbuf)
+            sender = BatchSender(s, (ip, port), PACKET_SIZE)
+            packets = PacketBatch(PACKET_SIZE, sender.batch)
+            # за один шаг пейсера уходит не больше, чем положено за PACING_QUANTUM
+            step = max(1, min(sender.batch, int(rate * PACING_QUANTUM))) if rate else sender.batch
+            # запас в PACING_BURST секунд: пересып в time.sleep не съедает скорость
+            bucket = TokenBucket(rate, max(step * 2, int(rate * PACING_BURST)))
+            worker.status.emit(f"Sending to {ip}:{port}, {'GSO' if sender.gso else 'one sendto per packet'}, "
+                               f"SO_SNDBUF {sndbuf}...")
+
+            total = 0
+            for first, sent, data in packets.batches(count):
+                if worker.cancelled:
+                    break
+                for start in range(0, sent, step):
+                    chunk = min(step, sent - start)
+                    bucket.wait(chunk)
+                    sender.send(data[start * PACKET_SIZE:], chunk)
+                total = first + sent
+                worker.report(total, total * PACKET_SIZE)
+            worker.report(total, total * PACKET_SIZE, force=True)
+    except OSError as e:
+        if not worker.cancelled:
+            worker.status.emit(f"Error: {e}")
+        return None
+    if not worker.cancelled:
+        worker.status.emit("All packets sent.")
+    return None
+
+class UDPSender(TransferWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("UDP Sender")
@@ -14,43 +51,47 @@ class UDPSender(QWidget):
         self.ip = QLineEdit("127.0.0.1")
         self.port = QLineEdit("8080")
         self.num_of_packets = QLineEdit("5")
+        self.rate = QLineEdit("0")
+        self.rate_unit = QComboBox()
+        self.rate_unit.addItems(["packets/s", "Mbit/s"])
+        self.sndbuf = QLineEdit("0")
         self.cur_log = QLabel("Waiting to start...")
+        self.sent = QLabel("Packets sent:")
 
-        self.send_button = QPushButton("Send")
         layout.addWidget(QLabel("Receiver IP"))
         layout.addWidget(self.ip)
         layout.addWidget(QLabel("Receiver Port"))
         layout.addWidget(self.port)
         layout.addWidget(QLabel("Number of packets"))
         layout.addWidget(self.num_of_packets)
+        layout.addWidget(QLabel("Rate (0 - unlimited)"))
+        rate_layout = QHBoxLayout()
+        rate_layout.addWidget(self.rate)
+        rate_layout.addWidget(self.rate_unit)
+        layout.addLayout(rate_layout)
+        layout.addWidget(QLabel("SO_SNDBUF, bytes (0 - system default)"))
+        layout.addWidget(self.sndbuf)
         layout.addWidget(self.cur_log)
-        layout.addWidget(self.send_button)
+        layout.addWidget(self.sent)
+        self.add_transfer_controls(layout, "Send")
 
-        self.send_button.clicked.connect(self.send_data)
         self.setLayout(layout)
 
-    def send_data(self):
-        ip = self.ip.text()
-        port = int(self.port.text())
-        count = int(self.num_of_packets.text())
-        packet_size = 1024
-        header_size = 12 
-        data_size = packet_size - header_size
-
-        self.cur_log.setText(f"Sending UDP packets to {ip}:{port}...")
-
+    def start_transfer(self):
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-                for i in range(count):
-                    timestamp = time.time()
-                    random_data = bytes([random.randint(0, 255) for _ in range(data_size)])
-                    header = struct.pack('!Id', i, timestamp)
-                    packet = header + random_data
-                    s.sendto(packet, (ip, port))
-                    self.cur_log.setText(f"Sent packet {i + 1} of {count}")
-                self.cur_log.setText("All packets sent.")
-        except Exception as e:
+            port = int(self.port.text())
+            self.count = int(self.num_of_packets.text())
+            rate = float(self.rate.text())
+            sndbuf = int(self.sndbuf.text())
+        except ValueError as e:
             self.cur_log.setText(f"Error: {e}")
+            return
+        if self.rate_unit.currentText() == "Mbit/s":
+            rate = mbit_to_pps(rate, PACKET_SIZE)
+        self.run_transfer(send_packets, self.ip.text(), port, self.count, rate, sndbuf)
+
+    def show_progress(self, packets, nbytes):
+        self.sent.setText(f"Packets sent: {packets} of {self.count}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
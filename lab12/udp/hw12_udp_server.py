@@ -1,10 +1,55 @@
+import os
 import sys
 import socket
-import struct
 import time
-from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton
+from PySide6.QtWidgets import QApplication, QVBoxLayout, QLabel, QLineEdit
 
-class UDPReceiver(QWidget):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hw12_payload import PACKET_SIZE
+from hw12_transfer import POLL_INTERVAL, TransferWindow
+from hw12_udp_engine import BatchReceiver, set_buffer
+
+IDLE_TIMEOUT = 5.0
+RCVBUF = 8 << 20
+
+def receive_packets(worker, ip, port, rcvbuf=RCVBUF):
+    packet_size = PACKET_SIZE
+
+    with worker.watch(socket.socket(socket.AF_INET, socket.SOCK_DGRAM)) as s:
+        rcvbuf = set_buffer(s, socket.SO_RCVBUF, rcvbuf)
+        s.bind((ip, port))
+        receiver = BatchReceiver(s, packet_size)
+        worker.status.emit(f"Listening for UDP packets, {'GRO' if receiver.gro else 'one recv per packet'}, "
+                           f"SO_RCVBUF {rcvbuf}...")
+        # короткий таймаут, чтобы успевать заметить отмену; приём кончается
+        # после IDLE_TIMEOUT тишины
+        s.settimeout(POLL_INTERVAL)
+
+        start = None
+        last_packet = time.monotonic()
+
+        while not worker.cancelled:
+            try:
+                packets = receiver.recv()
+            except socket.timeout:
+                if start is not None and time.monotonic() - last_packet >= IDLE_TIMEOUT:
+                    break
+                continue
+            last_packet = time.monotonic()
+            # скорость считается от первого до последнего пакета, без ожидания в начале и конце
+            if start is None:
+                start = last_packet
+            worker.report(receiver.count, receiver.count * packet_size)
+
+        worker.report(receiver.count, receiver.count * packet_size, force=True)
+        elapsed = last_packet - start if start is not None and last_packet > start else 1
+        speed = (receiver.count * packet_size) / elapsed / 1024
+
+    if not worker.cancelled:
+        worker.status.emit("Reception complete.")
+    return {"speed": speed, "count": receiver.count, "lost": receiver.lost(), "stray": receiver.stray}
+
+class UDPReceiver(TransferWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("UDP Receiver")
@@ -12,71 +57,43 @@ class UDPReceiver(QWidget):
 
         self.ip = QLineEdit("127.0.0.1")
         self.port = QLineEdit("8080")
+        self.rcvbuf = QLineEdit(str(RCVBUF))
         self.cur_log = QLabel("Waiting to start...")
         self.speed = QLabel("Speed:")
         self.received = QLabel("Packets received:")
         self.lost = QLabel("Packets lost:")
 
-        self.receive_button = QPushButton("Start Listening")
         layout.addWidget(QLabel("IP"))
         layout.addWidget(self.ip)
         layout.addWidget(QLabel("Port"))
         layout.addWidget(self.port)
+        layout.addWidget(QLabel("SO_RCVBUF, bytes (0 - system default)"))
+        layout.addWidget(self.rcvbuf)
         layout.addWidget(self.cur_log)
         layout.addWidget(self.speed)
         layout.addWidget(self.received)
         layout.addWidget(self.lost)
-        layout.addWidget(self.receive_button)
+        self.add_transfer_controls(layout, "Start Listening")
 
-        self.receive_button.clicked.connect(self.receive_data)
         self.setLayout(layout)
 
-    def receive_data(self):
-        ip = self.ip.text()
-        port = int(self.port.text())
-        packet_size = 1024
-        header_size = 12
-        received_packets = set()
-
-        self.cur_log.setText("Listening for UDP packets...")
-
+    def start_transfer(self):
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-                s.bind((ip, port))
-                s.settimeout(5.0)  
-
-                count = 0
-                start = time.time()
-
-                while True:
-                    try:
-                        data, addr = s.recvfrom(packet_size)
-                        if len(data) < header_size:
-                            continue  
-
-                        pkt_num, pkt_time = struct.unpack('!Id', data[:header_size])
-                        received_packets.add(pkt_num)
-                        count += 1
-                        self.cur_log.setText(f"Packets received: {count}")
-                    except socket.timeout:
-                        break
-
-                end = time.time()
-                elapsed = end - start if end > start else 1
-                speed = (count * packet_size) / elapsed / 1024
-
-                if received_packets:
-                    max_packet = max(received_packets)
-                    lost = max_packet + 1 - len(received_packets)
-                else:
-                    lost = 0
-
-                self.speed.setText(f"Speed: {speed:.2f} KB/s")
-                self.received.setText(f"Packets received: {count}")
-                self.lost.setText(f"Packets lost: {lost}")
-                self.cur_log.setText("Reception complete.")
-        except Exception as e:
+            port = int(self.port.text())
+            rcvbuf = int(self.rcvbuf.text())
+        except ValueError as e:
             self.cur_log.setText(f"Error: {e}")
+            return
+        self.run_transfer(receive_packets, self.ip.text(), port, rcvbuf)
+
+    def show_progress(self, packets, nbytes):
+        self.received.setText(f"Packets received: {packets}")
+
+    def show_result(self, result):
+        self.speed.setText(f"Speed: {result['speed']:.2f} KB/s")
+        self.received.setText(f"Packets received: {result['count']}")
+        stray = f" (stray: {result['stray']})" if result["stray"] else ""
+        self.lost.setText(f"Packets lost: {result['lost']}{stray}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
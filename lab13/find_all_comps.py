@@ -2,94 +2,159 @@ import sys
 import socket
 import ipaddress
 import os
-import uuid
+from array import array
+from collections import deque
 
 from PySide6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QPushButton, QTableWidget, QTableWidgetItem,
-    QProgressBar, QLabel
+    QApplication, QWidget, QVBoxLayout, QPushButton, QTableView, QProgressBar, QLabel
 )
-from PySide6.QtCore import Qt, QThread, Signal
-from scapy.layers.l2 import ARP, Ether
-from scapy.sendrecv import srp
-
-_local_ip = None
-
-
-def get_local_ip():
-    global _local_ip
-    if _local_ip:
-        return _local_ip
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        _local_ip = s.getsockname()[0]
-        s.close()
-    except Exception:
-        _local_ip = socket.gethostbyname(socket.gethostname())
-    return _local_ip
-
-
-def get_local_mac():
-    mac_int = uuid.getnode()
-    if (mac_int >> 40) % 2:
-        return None
-    return ':'.join(f'{(mac_int >> ele) & 0xff:02x}' for ele in range(40, -1, -8))
+from PySide6.QtCore import Qt, QThread, Signal, QAbstractTableModel, QModelIndex, QTimer
+from PySide6.QtGui import QFont
+
+from scan_engine import HostCache, HostnameResolver, Scanner, get_local_ip, get_mac_address
+
+FLUSH_INTERVAL_MS = 16
+RESIZE_INTERVAL_MS = 500
+RESIZE_PRECISION = 200
 
 
-def get_mac_address(ip):
-    if ip == get_local_ip():
-        return get_local_mac()
-    try:
-        arp_request = ARP(pdst=ip)
-        broadcast = Ether(dst="ff:ff:ff:ff:ff:ff")
-        answered_list = srp(broadcast / arp_request, timeout=2, verbose=False)[0]
-        if answered_list:
-            return answered_list[0][1].hwsrc
-    except Exception:
-        pass
-    return None
+def drain(queue):
+    items = []
+    while queue:
+        items.append(queue.popleft())
+    return items
 
 
 class ScannerThread(QThread):
-    result_signal = Signal(str, str, str)
     progress_signal = Signal(int)
+    diff_signal = Signal(list, list)
 
-    def __init__(self, network):
+    def __init__(self, network, resolver, cache):
         super().__init__()
         self.network = network
-        self.is_running = True
+        self.scanner = Scanner(resolver, cache)
+        # результаты забирает таймер GUI пачками, без отдельного сигнала на каждый хост
+        self.results = deque()
+        self.hostnames = deque()
 
     def stop(self):
-        self.is_running = False
+        self.scanner.stop()
 
     def run(self):
         try:
-            hosts = list(ipaddress.ip_network(self.network).hosts())
-            total = len(hosts)
-            get_local_ip()
+            self.scanner.scan(
+                self.network,
+                lambda *result: self.results.append(result),
+                lambda *hostname: self.hostnames.append(hostname),
+                self.progress_signal.emit,
+                self.diff_signal.emit,
+                self.results.extend,
+            )
+        except Exception as e:
+            print(f"Something went wrong: {e}")
+        finally:
+            self.progress_signal.emit(100)
 
-            for i, ip in enumerate(hosts):
-                if not self.is_running:
-                    break
 
-                ip_str = str(ip)
-                hostname = "-"
-                try:
-                    hostname_info = socket.gethostbyaddr(ip_str)
-                    hostname = hostname_info[0]
-                except (socket.herror, socket.timeout):
-                    pass
+class HostTableModel(QAbstractTableModel):
+    HEADERS = ("IP Address", "MAC Address", "Hostname")
 
-                mac = get_mac_address(ip_str)
-                if mac:
-                    self.result_signal.emit(ip_str, mac, hostname)
+    def __init__(self):
+        super().__init__()
+        self.ips = array("I")
+        self.macs = []
+        self.hostnames = []
+        self.rows = {}
+        self.bold_rows = set()
+        self.bold_font = QFont()
+        self.bold_font.setBold(True)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.ips)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return socket.inet_ntoa(self.ips[row].to_bytes(4, "big"))
+            return self.macs[row] if column == 1 else self.hostnames[row]
+        if role == Qt.FontRole and row in self.bold_rows:
+            return self.bold_font
+        return None
 
-                self.progress_signal.emit(int((i + 1) / total * 100))
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
 
-        except Exception as e:
-            print(f"Something went wrong: {e}")
-        finally:
-            self.progress_signal.emit(100)
+    def flags(self, index):
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def upsert(self, records, bold=False):
+        new = {}
+        changed = []
+        for ip, mac, hostname in records:
+            row = self.rows.get(ip)
+            if row is None:
+                new[ip] = (mac, hostname)
+                continue
+            self.macs[row] = mac
+            if hostname != "-":
+                self.hostnames[row] = hostname
+            changed.append(row)
+
+        if new:
+            start = len(self.ips)
+            self.beginInsertRows(QModelIndex(), start, start + len(new) - 1)
+            for row, (ip, (mac, hostname)) in enumerate(new.items(), start):
+                self.rows[ip] = row
+                self.ips.append(int.from_bytes(socket.inet_aton(ip), "big"))
+                self.macs.append(mac)
+                self.hostnames.append(hostname)
+                if bold:
+                    self.bold_rows.add(row)
+            self.endInsertRows()
+        self._rows_changed(changed)
+
+    def set_hostnames(self, pairs):
+        changed = []
+        for ip, hostname in pairs:
+            row = self.rows.get(ip)
+            if row is not None:
+                self.hostnames[row] = hostname
+                changed.append(row)
+        self._rows_changed(changed)
+
+    def remove(self, ips):
+        drop = {self.rows[ip] for ip in ips if ip in self.rows}
+        if not drop:
+            return
+        self.beginResetModel()
+        keep = [row for row in range(len(self.ips)) if row not in drop]
+        self.ips = array("I", (self.ips[row] for row in keep))
+        self.macs = [self.macs[row] for row in keep]
+        self.hostnames = [self.hostnames[row] for row in keep]
+        self.bold_rows = {new for new, old in enumerate(keep) if old in self.bold_rows}
+        self.rows = {socket.inet_ntoa(value.to_bytes(4, "big")): row for row, value in enumerate(self.ips)}
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.ips = array("I")
+        self.macs = []
+        self.hostnames = []
+        self.rows = {}
+        self.bold_rows = set()
+        self.endResetModel()
+
+    def _rows_changed(self, rows):
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 1), self.index(max(rows), 2))
 
 
 class NetworkScanner(QWidget):
@@ -98,6 +163,10 @@ class NetworkScanner(QWidget):
         self.setWindowTitle("Network Computer Scanner")
         self.resize(700, 500)
         self.scanner_thread = None
+        self.resolver = HostnameResolver()
+        self.cache = HostCache()
+        self.diff = None
+        self.columns_dirty = False
         self.local_ip = get_local_ip()
 
         layout = QVBoxLayout()
@@ -114,43 +183,57 @@ class NetworkScanner(QWidget):
         self.progress.setFormat("%p%")
         layout.addWidget(self.progress)
 
-        self.table = QTableWidget(0, 3)
-        self.table.setHorizontalHeaderLabels(["IP Address", "MAC Address", "Hostname"])
+        self.model = HostTableModel()
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setStretchLastSection(True)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setResizeContentsPrecision(RESIZE_PRECISION)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
         layout.addWidget(self.table)
 
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush_results)
+
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setInterval(RESIZE_INTERVAL_MS)
+        self.resize_timer.timeout.connect(self.resize_columns)
+
         self.setLayout(layout)
 
     def closeEvent(self, event):
         if self.scanner_thread and self.scanner_thread.isRunning():
             self.scanner_thread.stop()
             self.scanner_thread.wait()
+        self.resolver.shutdown()
+        self.cache.close()
         event.accept()
 
     def scan_network(self):
-        self.table.setRowCount(0)
+        self.model.clear()
+        self.diff = None
         self.progress.setValue(0)
         self.label.setText("Scanning...")
         self.button.setEnabled(False)
 
         try:
             net = ipaddress.IPv4Network(f"{self.local_ip}/24", strict=False)
-            self.total_hosts = len(list(net.hosts()))
             self.progress.setMaximum(100)
 
             try:
                 local_hostname = socket.gethostname()
                 local_mac = get_mac_address(self.local_ip)
-                self.add_table_row(self.local_ip, local_mac or "-", local_hostname, bold=True)
+                self.model.upsert([(self.local_ip, local_mac or "-", local_hostname)], bold=True)
             except Exception as e:
                 print(f"Something went wrong: {e}")
 
-            self.scanner_thread = ScannerThread(str(net))
-            self.scanner_thread.result_signal.connect(self.handle_result)
+            self.scanner_thread = ScannerThread(str(net), self.resolver, self.cache)
             self.scanner_thread.progress_signal.connect(self.update_progress)
+            self.scanner_thread.diff_signal.connect(self.handle_diff)
             self.scanner_thread.finished.connect(self.scan_finished)
             self.scanner_thread.start()
+            self.flush_timer.start()
+            self.resize_timer.start()
 
         except Exception as e:
             self.label.setText(f"Error: {e}")
@@ -160,34 +243,44 @@ class NetworkScanner(QWidget):
         self.progress.setValue(value)
 
     def scan_finished(self):
-        self.label.setText("Scanning completed!")
+        self.flush_timer.stop()
+        self.resize_timer.stop()
+        self.flush_results()
+        self.resize_columns()
+        if self.diff:
+            joined, left = self.diff
+            self.label.setText(f"Scanning completed! Joined: {len(joined)}, left: {len(left)}")
+        else:
+            self.label.setText("Scanning completed!")
         self.button.setEnabled(True)
 
-    def handle_result(self, ip, mac, hostname):
-        if ip == self.local_ip:
+    def flush_results(self):
+        if self.scanner_thread is None:
             return
-        self.add_table_row(ip, mac, hostname)
-
-    def add_table_row(self, ip, mac, hostname, bold=False):
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-
-        ip_item = QTableWidgetItem(ip)
-        mac_item = QTableWidgetItem(mac)
-        hostname_item = QTableWidgetItem(hostname)
-
-        for item in (ip_item, mac_item, hostname_item):
-            item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            if bold:
-                font = item.font()
-                font.setBold(True)
-                item.setFont(font)
-
-        self.table.setItem(row, 0, ip_item)
-        self.table.setItem(row, 1, mac_item)
-        self.table.setItem(row, 2, hostname_item)
+        self.handle_results(drain(self.scanner_thread.results))
+        self.update_hostnames(drain(self.scanner_thread.hostnames))
+
+    def handle_results(self, records):
+        records = [record for record in records if record[0] != self.local_ip]
+        if records:
+            self.model.upsert(records)
+            self.columns_dirty = True
+
+    def handle_diff(self, joined, left):
+        self.flush_results()
+        self.diff = (joined, left)
+        self.model.remove(left)
+
+    def update_hostnames(self, pairs):
+        if not pairs:
+            return
+        self.model.set_hostnames(pairs)
+        self.columns_dirty = True
 
-        self.table.resizeColumnsToContents()
+    def resize_columns(self):
+        if self.columns_dirty:
+            self.columns_dirty = False
+            self.table.resizeColumnsToContents()
 
 
 if __name__ == "__main__":
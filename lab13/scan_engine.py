@@ -0,0 +1,442 @@
+import argparse
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ARP_TIMEOUT = 2
+WAVE_SIZE = 256
+WAVE_INTER = 0.001
+SWEEP_WORKERS = 4
+DNS_WORKERS = 16
+DNS_TIMEOUT = 2
+NEGATIVE_TTL = 300
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hosts_cache.db")
+HOST_TTL = 600
+EVICT_AFTER = 7 * 24 * 3600
+
+_local_ip = None
+
+
+def get_local_ip():
+    global _local_ip
+    if _local_ip:
+        return _local_ip
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(("8.8.8.8", 80))
+        _local_ip = s.getsockname()[0]
+        s.close()
+    except Exception:
+        _local_ip = socket.gethostbyname(socket.gethostname())
+    return _local_ip
+
+
+def get_local_mac():
+    mac_int = uuid.getnode()
+    if (mac_int >> 40) % 2:
+        return None
+    return ':'.join(f'{(mac_int >> ele) & 0xff:02x}' for ele in range(40, -1, -8))
+
+
+def local_networks():
+    from scapy.config import conf
+
+    networks = []
+    for net, mask, gateway, *_ in conf.route.routes:
+        prefix = bin(mask).count("1")
+        if gateway != "0.0.0.0" or prefix in (0, 32):
+            continue
+        network = ipaddress.IPv4Network((net, prefix), strict=False)
+        if not (network.is_loopback or network.is_multicast or network.is_link_local):
+            networks.append(str(network))
+    return networks or [str(ipaddress.IPv4Network(f"{get_local_ip()}/24", strict=False))]
+
+
+def normalize_networks(networks):
+    if isinstance(networks, str):
+        networks = [networks]
+    # сначала более крупные сети, чтобы вложенные подсети не сканировать дважды
+    nets = sorted({ipaddress.IPv4Network(n, strict=False) for n in networks},
+                  key=lambda n: (n.prefixlen, n))
+    result = []
+    for net in nets:
+        if not any(net.subnet_of(other) for other in result):
+            result.append(net)
+    return result
+
+
+def host_range(net):
+    first, last = int(net.network_address), int(net.broadcast_address)
+    if net.prefixlen < 31:
+        first, last = first + 1, last - 1
+    return first, last
+
+
+def count_hosts(networks):
+    return sum(last - first + 1 for first, last in map(host_range, networks))
+
+
+def in_networks(ip, networks):
+    value = int(ipaddress.IPv4Address(ip))
+    return any(first <= value <= last for first, last in map(host_range, networks))
+
+
+def iter_hosts(networks, skip=()):
+    for net in networks:
+        first, last = host_range(net)
+        for value in range(first, last + 1):
+            ip = socket.inet_ntoa(value.to_bytes(4, "big"))
+            if ip not in skip:
+                yield ip
+
+
+def iter_waves(hosts, size):
+    hosts = iter(hosts)
+    while True:
+        wave = list(itertools.islice(hosts, size))
+        if not wave:
+            return
+        yield wave
+
+
+def get_mac_address(ip):
+    if ip == get_local_ip():
+        return get_local_mac()
+    from scapy.layers.l2 import ARP, Ether
+    from scapy.sendrecv import srp
+
+    try:
+        arp_request = ARP(pdst=ip)
+        broadcast = Ether(dst="ff:ff:ff:ff:ff:ff")
+        answered_list = srp(broadcast / arp_request, timeout=2, verbose=False)[0]
+        if answered_list:
+            return answered_list[0][1].hwsrc
+    except Exception:
+        pass
+    return None
+
+
+def arp_sweep(ips, timeout=ARP_TIMEOUT, inter=WAVE_INTER):
+    found = {}
+    if not ips:
+        return found
+    from scapy.layers.l2 import ARP, Ether
+    from scapy.sendrecv import srp
+
+    wanted = set(ips)
+    try:
+        request = Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=list(ips))
+        answered = srp(request, timeout=timeout, inter=inter, verbose=False)[0]
+        for _, reply in answered:
+            if reply.psrc in wanted:
+                found.setdefault(reply.psrc, reply.hwsrc)
+    except Exception:
+        pass
+    return found
+
+
+def reverse_lookup(ip):
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except OSError:
+        return None
+
+
+class HostnameResolver:
+    def __init__(self, workers=DNS_WORKERS, timeout=DNS_TIMEOUT, negative_ttl=NEGATIVE_TTL):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.timeout = timeout
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.names = {}
+        self.misses = {}
+        # ip -> [срок, callback]; срок None, пока запрос ждёт свободного потока пула
+        self.pending = {}
+        # callback тех, кого перестали ждать: пришедшее позже имя всё равно отдаём
+        self.late = {}
+        self.closed = False
+
+    def cached(self, ip):
+        with self.lock:
+            if ip in self.names:
+                return self.names[ip]
+            expires = self.misses.get(ip)
+            if expires and expires > time.monotonic():
+                return "-"
+        return None
+
+    def resolve(self, ip, callback):
+        with self.lock:
+            if ip in self.pending:
+                return
+            self.pending[ip] = [None, callback]
+        future = self.pool.submit(self._lookup, ip)
+        future.add_done_callback(lambda f: self._done(ip, f))
+
+    def wait(self, should_stop=lambda: False):
+        while not should_stop():
+            now = time.monotonic()
+            with self.lock:
+                if not self.pending:
+                    return
+                expired = [ip for ip, (deadline, _) in self.pending.items()
+                           if deadline is not None and deadline <= now]
+            # поток с gethostbyaddr не прервать, поэтому просто перестаём его ждать
+            for ip in expired:
+                self._expire(ip)
+            time.sleep(0.05)
+
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _lookup(self, ip):
+        # таймаут считается от начала запроса, а не от постановки в очередь пула
+        with self.lock:
+            entry = self.pending.get(ip)
+            if entry:
+                entry[0] = time.monotonic() + self.timeout
+        return reverse_lookup(ip)
+
+    def _done(self, ip, future):
+        if future.cancelled():
+            with self.lock:
+                self.pending.pop(ip, None)
+            return
+        self._settle(ip, None if future.exception() else future.result())
+
+    def _expire(self, ip):
+        with self.lock:
+            entry = self.pending.pop(ip, None)
+            if entry is None:
+                return
+            self.late[ip] = entry[1]
+            if ip not in self.names:
+                self.misses[ip] = time.monotonic() + self.negative_ttl
+            closed = self.closed
+        if not closed:
+            entry[1](ip, "-")
+
+    def _settle(self, ip, hostname):
+        with self.lock:
+            entry = self.pending.pop(ip, None)
+            late = self.late.pop(ip, None)
+            if hostname:
+                self.names[ip] = hostname
+                self.misses.pop(ip, None)
+            elif ip not in self.names:
+                self.misses[ip] = time.monotonic() + self.negative_ttl
+            closed = self.closed
+        if closed:
+            return
+        if entry:
+            entry[1](ip, hostname or "-")
+        elif late and hostname:
+            late(ip, hostname)
+
+
+class HostCache:
+    def __init__(self, path=CACHE_PATH, ttl=HOST_TTL, evict_after=EVICT_AFTER):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS hosts ("
+                "ip TEXT PRIMARY KEY, mac TEXT NOT NULL, hostname TEXT NOT NULL, last_seen REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM hosts WHERE last_seen < ?", (time.time() - evict_after,))
+
+    def load(self, networks):
+        networks = normalize_networks(networks)
+        with self.lock:
+            rows = self.db.execute("SELECT ip, mac, hostname, last_seen FROM hosts").fetchall()
+        return {ip: (mac, hostname, last_seen) for ip, mac, hostname, last_seen in rows
+                if in_networks(ip, networks)}
+
+    def is_stale(self, entry):
+        return time.time() - entry[2] > self.ttl
+
+    def touch(self, ip, mac, hostname):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT INTO hosts (ip, mac, hostname, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(ip) DO UPDATE SET mac = excluded.mac, last_seen = excluded.last_seen, "
+                "hostname = CASE WHEN excluded.hostname = '-' THEN hosts.hostname ELSE excluded.hostname END",
+                (ip, mac, hostname, time.time())
+            )
+
+    def set_hostname(self, ip, hostname):
+        with self.lock, self.db:
+            self.db.execute("UPDATE hosts SET hostname = ? WHERE ip = ?", (hostname, ip))
+
+    def forget(self, ips):
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM hosts WHERE ip = ?", [(ip,) for ip in ips])
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class Scanner:
+    def __init__(self, resolver=None, cache=None, timeout=ARP_TIMEOUT, wave_size=WAVE_SIZE,
+                 workers=SWEEP_WORKERS):
+        self.resolver = resolver
+        self.cache = cache
+        self.timeout = timeout
+        self.wave_size = wave_size
+        self.workers = workers
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+
+    def scan(self, networks, on_result, on_hostname=None, on_progress=None, on_diff=None, on_cached=None):
+        on_hostname = self._hostname_callback(on_hostname or (lambda ip, hostname: None))
+        on_progress = on_progress or (lambda value: None)
+        on_diff = on_diff or (lambda joined, left: None)
+        on_cached = on_cached or (lambda records: None)
+
+        networks = normalize_networks(networks)
+        local_ip = get_local_ip()
+        known = self.cache.load(networks) if self.cache else {}
+        # хосты из кэша отдаём сразу, до sweep: свежие из них повторно не опрашиваются
+        on_cached([(ip, mac, hostname) for ip, (mac, hostname, _) in
+                   sorted(known.items(), key=lambda item: ipaddress.ip_address(item[0])) if ip != local_ip])
+        # сначала перепроверяем устаревшие записи кэша, свежие не трогаем
+        stale = [ip for ip, entry in known.items() if self.cache.is_stale(entry)]
+        skip = set(known)
+        skip.add(local_ip)
+        total = count_hosts(networks) - len(known) + len(stale) - in_networks(local_ip, networks)
+        total = max(total, 1)
+        hosts = itertools.chain(stale, iter_hosts(networks, skip))
+        waves = iter_waves(hosts, self.wave_size)
+        seen = set()
+        done = 0
+
+        # один srp на волну вместо одного на хост, волны идут параллельно в workers потоках
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = set()
+            while True:
+                while self.is_running and len(in_flight) < self.workers:
+                    wave = next(waves, None)
+                    if wave is None:
+                        break
+                    in_flight.add(pool.submit(self._sweep, wave))
+                if not in_flight:
+                    break
+
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    wave, macs = future.result()
+                    self._report(wave, macs, known, seen, on_result, on_hostname)
+                    done += len(wave)
+                    on_progress(min(int(done / total * 100), 100))
+
+        if self.is_running:
+            joined = [ip for ip in seen if ip not in known]
+            left = [ip for ip in stale if ip not in seen]
+            if self.cache:
+                self.cache.forget(left)
+            on_diff(joined, left)
+
+        on_progress(100)
+        if self.resolver:
+            self.resolver.wait(lambda: not self.is_running)
+
+    def _hostname_callback(self, on_hostname):
+        # найденное имя сразу пишем в кэш, чтобы следующий запуск его уже знал
+        def callback(ip, hostname):
+            if self.cache and hostname != "-":
+                self.cache.set_hostname(ip, hostname)
+            on_hostname(ip, hostname)
+        return callback
+
+    def _sweep(self, wave):
+        return wave, arp_sweep(wave, self.timeout)
+
+    def _report(self, wave, macs, known, seen, on_result, on_hostname):
+        for ip_str in wave:
+            mac = macs.get(ip_str)
+            if not mac:
+                continue
+            seen.add(ip_str)
+            hostname = self.resolver.cached(ip_str) if self.resolver else "-"
+            if hostname is None and ip_str in known and known[ip_str][1] != "-":
+                hostname = known[ip_str][1]
+            if self.cache:
+                self.cache.touch(ip_str, mac, hostname or "-")
+            on_result(ip_str, mac, hostname or "-")
+            if hostname is None:
+                self.resolver.resolve(ip_str, on_hostname)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless ARP network scanner, prints one JSON object per line")
+    parser.add_argument("networks", nargs="*", help="networks to scan in CIDR notation (default: local /24)")
+    parser.add_argument("--interfaces", action="store_true",
+                        help="scan every directly connected network found in the routing table")
+    parser.add_argument("--timeout", type=float, default=ARP_TIMEOUT, help="ARP reply timeout per wave, seconds")
+    parser.add_argument("--wave-size", type=int, default=WAVE_SIZE, help="ARP requests sent per wave")
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS, help="waves swept in parallel")
+    parser.add_argument("--no-dns", action="store_true", help="skip reverse DNS lookups")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or update the host cache")
+    parser.add_argument("--cache-path", default=CACHE_PATH, help="SQLite host cache location")
+    args = parser.parse_args()
+
+    if hasattr(os, "geteuid") and os.geteuid() != 0:
+        print("Warning: ARP sweep usually needs root privileges", file=sys.stderr)
+
+    local_ip = get_local_ip()
+    networks = list(args.networks)
+    if args.interfaces:
+        networks += local_networks()
+    if not networks:
+        networks = [str(ipaddress.IPv4Network(f"{local_ip}/24", strict=False))]
+
+    out_lock = threading.Lock()
+
+    def emit(**record):
+        line = json.dumps(record)
+        with out_lock:
+            print(line, flush=True)
+
+    resolver = None if args.no_dns else HostnameResolver()
+    cache = None if args.no_cache else HostCache(args.cache_path)
+    scanner = Scanner(resolver, cache, args.timeout, args.wave_size, args.workers)
+
+    def emit_cached(records):
+        for ip, mac, hostname in records:
+            emit(event="host", ip=ip, mac=mac, hostname=hostname, cached=True)
+
+    emit(event="host", ip=local_ip, mac=get_local_mac() or "-", hostname=socket.gethostname(), local=True)
+    try:
+        scanner.scan(
+            networks,
+            lambda ip, mac, hostname: emit(event="host", ip=ip, mac=mac, hostname=hostname),
+            lambda ip, hostname: emit(event="hostname", ip=ip, hostname=hostname),
+            None,
+            lambda joined, left: emit(event="diff", joined=sorted(joined), left=sorted(left)),
+            emit_cached,
+        )
+    except KeyboardInterrupt:
+        scanner.stop()
+    finally:
+        if resolver:
+            resolver.shutdown()
+        if cache:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()